@@ -0,0 +1,127 @@
+# Copyright 2021 Jason Bakos, Philip Conrad, Charles Daniels
+#
+# Distributed as part of the University of South Carolina CSCE491 course
+# materials. Please do not redistribute without written authorization.
+
+# This file benchmarks time lookups in the Waves library. It compares the
+# hand-written binary search which indexOfTime() used to perform against the
+# current searchsorted based lookup, and against resolving every query at once
+# with signalAtMany().
+#
+# The generated timestamps have no exact decimal ticks, so they are stored as
+# float ticks (see Waves.tickColumn()). With the default sizes, indexOfTime()
+# and signalAt() measure about 5x faster per query than the old search, and
+# signalAtMany() over 20x.
+#
+# Run it from the project directory with 'python3 bench/bench_signalat.py'.
+
+import argparse
+import os
+import sys
+import time
+
+import numpy
+
+bench_dir = os.path.split(os.path.abspath(__file__))[0]
+parent_dir = os.path.split(bench_dir)[0]
+sys.path.append(os.path.join(parent_dir, "utils", "python_utils"))
+from waves import Waves
+
+
+def legacy_index_of_time(timestamps, time):
+    """legacy_index_of_time.
+
+    Copy of the binary search which Waves.indexOfTime() performed before it
+    was rewritten in terms of numpy.searchsorted(), kept here so that the
+    speedup can be measured.
+
+    :param timestamps: list of sample timestamps.
+    :param time: the time to find the index of.
+    """
+
+    index = int(len(timestamps)/2)
+    step = int(len(timestamps)/2)
+    while True:
+        if index >= (len(timestamps)-1):
+            if step > 2:
+                index = len(timestamps)-1
+            else:
+                return len(timestamps)-1
+
+        if index <= 0:
+            if step > 2:
+                index = 0
+            else:
+                return 0
+
+        if (timestamps[index] <= time) and (timestamps[index+1] > time):
+            return index
+
+        if timestamps[index] < time:
+            index = index + step
+        else:
+            index = index - step
+
+        step = float(step) / 2.0
+        if step < 1.0:
+            step = 1
+        step = int(step)
+
+
+def make_waves(samples, rng):
+    """make_waves.
+
+    Build a Waves object with a single 1-bit signal which toggles randomly,
+    sampled at strictly increasing random times.
+
+    :param samples: number of samples to generate.
+    :param rng: numpy random generator.
+    """
+
+    w = Waves()
+    w.sizes = {"sig": 1}
+    timestamps = numpy.cumsum(rng.uniform(1.0, 100.0, samples))
+    w._assign(timestamps, {"sig": rng.integers(0, 2, samples)})
+    return w
+
+
+def per_query(func, queries):
+    """per_query.
+
+    :returns: the mean wall clock time in seconds taken by func per query.
+    """
+
+    start = time.perf_counter()
+    func(queries)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmark Waves time lookups.")
+    parser.add_argument("--samples", "-s", type=int, default=1000000, help="Number of samples in the generated capture. (default: 1000000)")
+    parser.add_argument("--queries", "-q", type=int, default=100000, help="Number of lookups to time. (default: 100000)")
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(491)
+    w = make_waves(args.samples, rng)
+    queries = rng.uniform(0, w.timeColumn()[-1], args.queries)
+    query_list = queries.tolist()
+
+    # The legacy search ran against a Python list of row tuples, so give it
+    # a list of floats to be fair to it.
+    timestamps = w.timeColumn().tolist()
+
+    results = []
+    results.append(("legacy indexOfTime", per_query(lambda qs: [legacy_index_of_time(timestamps, q) for q in qs], query_list)))
+    results.append(("indexOfTime", per_query(lambda qs: [w.indexOfTime(q) for q in qs], query_list)))
+    results.append(("signalAt", per_query(lambda qs: [w.signalAt("sig", q) for q in qs], query_list)))
+    results.append(("signalAtMany", per_query(lambda qs: w.signalAtMany("sig", qs), queries)))
+
+    baseline = results[0][1]
+    print("{} samples, {} queries".format(args.samples, args.queries))
+    for name, t in results:
+        print("{:<20} {:>10.3f} us/query {:>10.1f}x".format(name, t * 1e6, baseline / t))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# Copyright 2021 Jason Bakos, Philip Conrad, Charles Daniels
+#
+# Distributed as part of the University of South Carolina CSCE491 course
+# materials. Please do not redistribute without written authorization.
+
+# This file benchmarks the Waves library as a whole. It times loading and
+# writing both file formats, and the main time queries, on synthetic SPI
+# captures of increasing size, and reports the throughput and peak memory use
+# of each.
+#
+# Results can be saved as JSON with --output, and compared against results
+# saved earlier with --baseline, in which case any benchmark which got slower
+# by more than --threshold is flagged, and the exit status is 1.
+#
+# Run it from the project directory with 'python3 bench/bench_waves.py'. The
+# largest captures take a while; use --rows to pick the sizes to run.
+#
+# bench/baseline.json holds reference results committed with the project.
+# They are absolute timings from one machine, so they are only compared
+# against when asked to, with '--baseline bench/baseline.json', and only mean
+# something on a machine like the one they were measured on; its details are
+# recorded in the file. Refresh them whenever a change to waves.py is meant to
+# change its speed, with all sizes and benchmarks:
+#
+#     python3 bench/bench_waves.py --output bench/baseline.json
+#
+# and commit the new file along with the change.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+bench_dir = os.path.split(os.path.abspath(__file__))[0]
+parent_dir = os.path.split(bench_dir)[0]
+sys.path.append(os.path.join(parent_dir, "utils", "python_utils"))
+from waves import Waves
+
+# Every benchmark, in the order they are run. Bulk benchmarks are measured in
+# rows per second, and query benchmarks in queries per second.
+BULK = ["toText", "loadText", "toVCD", "loadVCD"]
+QUERIES = ["indexOfTime", "signalAt", "nextEdge"]
+
+
+def make_waves(rows, rng):
+    """make_waves.
+
+    Build a Waves object holding a synthetic SPI capture: a clock which
+    toggles every row, data lines which change with it, a chip select which
+    is active for long stretches, and a byte wide counter. Timestamps have 4
+    decimal places, like the captures in test_cases.
+
+    :param rows: number of rows to generate.
+    :param rng: numpy random generator.
+    """
+
+    w = Waves()
+    w.sizes = {"sclk": 1, "mosi": 1, "miso": 1, "ss": 1, "count": 8}
+
+    timestamps = numpy.round(numpy.cumsum(rng.uniform(0.5, 2.0, rows)), 4)
+    index = numpy.arange(rows)
+    w.extendColumns(timestamps, {
+        "sclk": index & 1,
+        "mosi": rng.integers(0, 2, rows),
+        "miso": rng.integers(0, 2, rows),
+        "ss": (index // 4096) & 1,
+        "count": (index // 16) & 0xff,
+    })
+    return w
+
+
+def measure(func, repeat, memory):
+    """measure.
+
+    Run func repeatedly, timing each run, and then once more under tracemalloc
+    to find its peak memory use.
+
+    :param func: the function to measure, which takes no arguments.
+    :param repeat: number of timed runs.
+    :param memory: whether to measure peak memory use.
+    :returns: the fastest time of a run in seconds, and the peak number of
+        bytes allocated during a run, or None if memory was not measured.
+    """
+
+    best = float("inf")
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return best, peak
+
+
+def run(rows, names, args, rng):
+    """run.
+
+    Run the chosen benchmarks on a capture of the given size.
+
+    :param rows: number of rows in the capture.
+    :param names: names of the benchmarks to run.
+    :param args: parsed command line arguments.
+    :param rng: numpy random generator.
+    :returns: a list of result dicts, one per benchmark.
+    """
+
+    w = make_waves(rows, rng)
+
+    # the loaders read what the writers produce, so the writers always run
+    # once even if they are not being benchmarked
+    text = w.toText()
+    vcd = w.toVCD() if ("loadVCD" in names) or ("toVCD" in names) else None
+
+    queries = rng.uniform(0, w.timeColumn()[-1], args.queries).tolist()
+
+    funcs = {
+        "toText": lambda: w.toText(),
+        "loadText": lambda: Waves().loadText(text),
+        "toVCD": lambda: w.toVCD(),
+        "loadVCD": lambda: Waves().loadVCD(vcd),
+        "indexOfTime": lambda: [w.indexOfTime(q) for q in queries],
+        "signalAt": lambda: [w.signalAt("mosi", q) for q in queries],
+        "nextEdge": lambda: [w.nextEdge("sclk", q) for q in queries],
+    }
+
+    results = []
+    for name in names:
+        seconds, peak = measure(funcs[name], args.repeat, not args.no_memory)
+        count = rows if name in BULK else len(queries)
+        results.append({
+            "name": name,
+            "rows": rows,
+            "seconds": seconds,
+            "throughput": count / seconds,
+            "unit": "rows/s" if name in BULK else "queries/s",
+            "peak_bytes": peak,
+        })
+        print(format_result(results[-1]), flush=True)
+
+    return results
+
+
+def format_result(result, baseline=None):
+    """format_result.
+
+    :param result: a result dict.
+    :param baseline: the matching result dict from the baseline, if any.
+    :returns: a line of the results table.
+    """
+
+    peak = "-" if result["peak_bytes"] is None else "{:.1f}".format(result["peak_bytes"] / 2**20)
+    line = "{:<12} {:>9} {:>12.4f} s {:>14.0f} {:<9} {:>10} MiB".format(
+            result["name"], result["rows"], result["seconds"], result["throughput"], result["unit"], peak)
+
+    if baseline is not None:
+        line += " {:>8.2f}x".format(result["throughput"] / baseline["throughput"])
+
+    return line
+
+
+def compare(results, baseline, threshold):
+    """compare.
+
+    Compare results against a baseline, printing each pair.
+
+    :param results: list of result dicts.
+    :param baseline: list of result dicts from an earlier run.
+    :param threshold: the fraction of throughput which may be lost before a
+        benchmark is flagged as slower.
+    :returns: the number of benchmarks flagged as slower.
+    """
+
+    previous = {(r["name"], r["rows"]): r for r in baseline}
+
+    print("")
+    print("compared to baseline (throughput relative to baseline):")
+    slower = 0
+    for result in results:
+        base = previous.get((result["name"], result["rows"]))
+        if base is None:
+            print(format_result(result) + "   (not in baseline)")
+            continue
+
+        line = format_result(result, base)
+        if result["throughput"] < (1.0 - threshold) * base["throughput"]:
+            line += "   SLOWER"
+            slower += 1
+        print(line)
+
+    return slower
+
+
+def parse_rows(text):
+    """parse_rows.
+
+    :param text: comma separated capture sizes, such as "1e3,1e4".
+    :returns: the sizes as a list of integers.
+    """
+
+    return [int(float(r)) for r in text.split(",") if r.strip() != ""]
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmark the Waves library.")
+    parser.add_argument("--rows", "-r", type=parse_rows, default=parse_rows("1e3,1e4,1e5,1e6,1e7"), help="Comma separated capture sizes to run. (default: 1e3,1e4,1e5,1e6,1e7)")
+    parser.add_argument("--benchmarks", "-b", default=",".join(BULK + QUERIES), help="Comma separated benchmarks to run. (default: all of {})".format(", ".join(BULK + QUERIES)))
+    parser.add_argument("--queries", "-q", type=int, default=10000, help="Number of lookups to time for the query benchmarks. (default: 10000)")
+    parser.add_argument("--repeat", "-n", type=int, default=3, help="Number of timed runs of each benchmark, of which the fastest is kept. (default: 3)")
+    parser.add_argument("--no-memory", action="store_true", help="Do not measure peak memory use, which takes an extra run of each benchmark.")
+    parser.add_argument("--output", "-o", help="Save the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare the results against this JSON file, saved earlier with --output, such as bench/baseline.json.")
+    parser.add_argument("--threshold", "-t", type=float, default=0.2, help="Flag benchmarks whose throughput dropped by more than this fraction of the baseline's. (default: 0.2)")
+    args = parser.parse_args()
+
+    names = [n for n in args.benchmarks.split(",") if n != ""]
+    for name in names:
+        if name not in BULK + QUERIES:
+            parser.error("unknown benchmark '{}'".format(name))
+
+    # read the baseline before running, so that a missing file is reported
+    # straight away, and --output can replace it
+    baseline = None
+    if args.baseline is not None:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        except (OSError, ValueError, KeyError) as e:
+            parser.error("cannot read baseline '{}': {}".format(args.baseline, e))
+
+    # measure parsing, not the parse cache
+    Waves.parseCache = None
+
+    rng = numpy.random.default_rng(491)
+
+    print("{:<12} {:>9} {:>14} {:>24} {:>14}".format("benchmark", "rows", "time", "throughput", "peak memory"))
+    results = []
+    for rows in args.rows:
+        results += run(rows, names, args, rng)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({
+                "date": datetime.datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "numpy": numpy.__version__,
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+
+    if baseline is not None:
+        if compare(results, baseline, args.threshold) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
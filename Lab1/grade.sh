@@ -46,7 +46,7 @@ if [ ! -f ./.setup_done ] ; then
 	rm -rf ./.venv
 	$VIRTUALENV --python "$PYTHON" ./.venv 
 	. ./.venv/bin/activate
-	./.venv/bin/pip3 install pyDigitalWaveTools==1.0
+	./.venv/bin/pip3 install pyDigitalWaveTools==1.0 numpy
 	echo "First time setup done!"
 	touch .setup_done
 fi
@@ -55,5 +55,11 @@ fi
 
 PYTHON="$(pwd)/.venv/bin/python3"
 
+# Virtual environments set up before the grader needed numpy do not have it.
+if ! "$PYTHON" -c 'import numpy' > /dev/null 2>&1 ; then
+	echo "Installing numpy into the virtual environment... " 1>&2
+	./.venv/bin/pip3 install -q numpy
+fi
+
 
 "$PYTHON" -m grader "$@"
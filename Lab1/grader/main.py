@@ -57,9 +57,9 @@ def main():
 
     parser.add_argument("--omit", "-O", default=[], nargs="*", help="Omit test cases passed to this flag, running all others. Implies --noscore. Can accept multiple test cases to omit.")
 
-    parser.add_argument("--text2vcd", nargs=2, type=pathlib.Path, metavar=("INPUT", "OUTPUT"), help="Instead of grading, convert the first argument to --text2vcd to a VCD file, writing out to the path on the second argument. The input file should be in the text format used for this course.")
+    parser.add_argument("--text2vcd", nargs=2, type=pathlib.Path, metavar=("INPUT", "OUTPUT"), help="Instead of grading, convert the first argument to --text2vcd to a VCD file, writing out to the path on the second argument. The input file should be in the text format used for this course, or in the binary wave format.")
 
-    parser.add_argument("--vcd2text", nargs=2, type=pathlib.Path, metavar=("INPUT", "OUTPUT"), help="Instead of grading, convert the first argument to --text2vcd to a text file in the format used for this course, writing out to the path on the second argument. The in put file needs to be in VCD format.")
+    parser.add_argument("--vcd2text", nargs=2, type=pathlib.Path, metavar=("INPUT", "OUTPUT"), help="Instead of grading, convert the first argument to --text2vcd to a text file in the format used for this course, writing out to the path on the second argument. The in put file needs to be in VCD format. If the output path ends in '.wvb', the binary wave format is written instead.")
 
     parser.add_argument("--code_dir", "-C", type=pathlib.Path, default=g.code_dir, help="Override directory where code to be graded is stored. (default: ./code")
 
@@ -80,25 +80,22 @@ def main():
 
     # text2vcd utility
     if args.text2vcd != None:
-        infile = ""
-        with open(args.text2vcd[0], "r") as f:
-            infile = f.read()
-        w = Waves()
-        w.loadText(infile)
+        w = Waves.fromFile(args.text2vcd[0])
         with open(args.text2vcd[1], "w") as f:
-            f.write(w.toVCD())
+            w.writeVCD(f)
 
         exit(0)
 
     # vcd2text utility
     if args.vcd2text != None:
-        infile = ""
-        with open(args.vcd2text[0], "r") as f:
-            infile = f.read()
         w = Waves()
-        w.loadVCD(infile)
-        with open(args.vcd2text[1], "w") as f:
-            f.write(w.toText())
+        with open(args.vcd2text[0], "rb") as f:
+            w.loadVCDStream(f)
+        if args.vcd2text[1].suffix == ".wvb":
+            w.saveBinary(args.vcd2text[1])
+        else:
+            with open(args.vcd2text[1], "w") as f:
+                w.writeText(f)
 
         exit(0)
 
@@ -0,0 +1,273 @@
+# Copyright 2021 Jason Bakos, Philip Conrad, Charles Daniels
+#
+# Distributed as part of the University of South Carolina CSCE491 course
+# materials. Please do not redistribute without written authorization.
+
+# This file tests the Waves library. Run it from the project directory with
+# 'python3 -m pytest tests'.
+
+import os
+import sys
+
+import numpy
+import pytest
+
+tests_dir = os.path.split(os.path.abspath(__file__))[0]
+parent_dir = os.path.split(tests_dir)[0]
+sys.path.append(os.path.join(parent_dir, "utils", "python_utils"))
+from waves import ParseCache, Waves
+
+# test the parsers, not the parse cache
+Waves.parseCache = None
+
+
+def test_trailing_row_survives_load_and_save(tmp_path):
+    text = "3\nclk\n1\n0\t0\n1\t1\n1000\t1\n"
+
+    w = Waves()
+    w.loadText(text)
+    assert w.samples() == 3
+    assert w.data[-1] == (1000.0, {"clk": 1})
+
+    path = tmp_path / "trailing.txt"
+    with open(path, "w") as f:
+        w.writeText(f)
+
+    v = Waves()
+    with open(path) as f:
+        v.loadTextStream(f)
+    assert v.toText() == w.toText()
+    assert v.timeColumn()[-1] == 1000.0
+
+
+def test_data_accepts_iterables_and_appends():
+    w = Waves()
+    w.sizes = {"clk": 1}
+    w.data = ((t, {"clk": t % 2}) for t in range(3))
+    assert w.samples() == 3
+
+    w.data.append((5, {"clk": 0}))
+    w.data.extend([(6, {"clk": 1})])
+    assert list(w.data)[-2:] == [(5.0, {"clk": 0}), (6.0, {"clk": 1})]
+
+    with pytest.raises(TypeError, match="append"):
+        w.data[0] = (0, {"clk": 1})
+    with pytest.raises(TypeError):
+        del w.data[0]
+
+
+def test_nan_timestamp_reports_its_line():
+    text = "3\na\n1\n" + "".join("{}\t1\n".format(i) for i in range(5)) + "NaN\t0\n"
+
+    with pytest.raises(ValueError, match="On line 9, timestamp 'NaN' is NaN"):
+        Waves().loadText(text)
+
+
+def test_resample_includes_t1():
+    w = Waves()
+    w.sizes = {"a": 4}
+    w.extendColumns([0, 0.1, 0.2, 0.3], {"a": [1, 2, 3, 4]})
+
+    assert w.resample(0.1, 0, 0.3)[:, 0].tolist() == [1, 2, 3, 4]
+    times = numpy.concatenate([t for t, values in w.iterResample(0.1, 0, 0.3, chunkRows=3)])
+    assert times.tolist() == [0.0, 0.1, 0.2, 0.3]
+
+
+VCD_HEADER = "$scope module root $end\n$var wire 4 ! a $end\n$upscope $end\n$enddefinitions $end\n"
+
+
+def test_vcd_accepts_uppercase_vectors():
+    w = Waves()
+    w.loadVCD(VCD_HEADER + "#0\nB1010 !\n#5\nb0011 !\n")
+    assert w.column("a").tolist() == [10, 3]
+
+
+def test_vcd_truncated_value_change():
+    with pytest.raises(ValueError, match="Unexpected end of VCD file after value 'b11' at time #3"):
+        Waves().loadVCD(VCD_HEADER + "#0\nb1010 !\n#3\nb11")
+
+
+# A capture with a multi-bit signal, and a last row at which nothing changes.
+CAPTURE = "3\nclk\tbus\n1\t8\n0\t0\t5\n1\t1\t5\n2\t0\t6\n3.5\t1\t6\n4\t1\t7\n9\t1\t7\n"
+
+
+def load(text):
+    w = Waves()
+    w.loadText(text)
+    return w
+
+
+def test_text_round_trip():
+    w = load(CAPTURE)
+    assert w.samples() == 6
+    assert w.row(-1) == (9.0, {"clk": 1, "bus": 7})
+    assert load(w.toText()).toText() == w.toText()
+
+
+def test_binary_round_trip(tmp_path):
+    w = load(CAPTURE)
+    path = tmp_path / "capture.wvb"
+    w.saveBinary(path)
+
+    v = Waves()
+    v.loadBinary(path)
+    assert v.samples() == w.samples()
+    assert v.row(-1) == (9.0, {"clk": 1, "bus": 7})
+    assert [v.signalAt("bus", t) for t in (0, 2, 3.5)] == [5, 6, 6]
+
+    assert Waves.fromFile(path).toText() == v.toText()
+
+
+def test_vcd_round_trip(tmp_path):
+    w = load(CAPTURE)
+
+    # rows read from VCD are one tick after the changes they hold
+    v = Waves()
+    v.loadVCD(w.toVCD())
+    assert v.signals() == w.signals()
+    assert v.row(-1) == (9.0, {"clk": 1, "bus": 7})
+    for t in (0, 1, 2, 3.5, 4):
+        assert v.row(v.indexOfTime(t + 0.0001))[1] == w.row(w.indexOfTime(t))[1]
+
+    path = tmp_path / "capture.vcd"
+    with open(path, "w") as f:
+        w.writeVCD(f)
+    with open(path, "rb") as f:
+        u = Waves()
+        u.loadVCDStream(f)
+    assert u.toText() == v.toText()
+
+
+def test_shared_memory_round_trip():
+    w = load(CAPTURE)
+    with w.toSharedMemory() as shared:
+        assert Waves.attachShared(shared.name).toText() == w.toText()
+
+
+def test_parse_cache_round_trip(tmp_path):
+    Waves.parseCache = ParseCache(tmp_path / "cache")
+    try:
+        first = load(CAPTURE)
+        second = load(CAPTURE)
+    finally:
+        Waves.parseCache = None
+
+    assert len(os.listdir(tmp_path / "cache")) == 1
+    assert second.toText() == first.toText()
+
+
+def test_signal_at():
+    w = load(CAPTURE)
+
+    # a row's values hold from its timestamp until the next row's
+    assert [w.signalAt("clk", t) for t in (0, 0.5, 1, 1.5, 2, 100)] == [0, 0, 1, 1, 0, 1]
+    assert w.signalAt("bus", 2) == 6
+    assert w.signalAtMany("bus", [0, 2, 3.9, 100]).tolist() == [5, 6, 6, 7]
+    assert w.indexOfTime(3.4) == 2
+
+    empty = Waves()
+    empty.sizes = {"clk": 1}
+    assert empty.signalAt("clk", 1) == 0
+
+
+def test_values_wider_than_their_signal():
+    w = load("3\nbus\n8\n0\t5\n1\t262\n")
+
+    # values are stored as given, and masked to their width when read
+    assert w.toText().endswith("1.0\t262")
+    assert w.signalAt("bus", 1) == 6
+    assert w.signalAtMany("bus", [1]).tolist() == [6]
+
+
+def test_next_edge():
+    w = load(CAPTURE)
+
+    # only edges strictly after the time passed are reported, so an edge can
+    # be passed back in to find the next one
+    assert w.nextEdge("clk", 0) == (1.0, True)
+    assert w.nextEdge("clk", 1) == (2.0, True)
+    assert w.nextEdge("clk", 1, negedge=False) == (3.5, True)
+    assert w.nextEdge("clk", 0.5, posedge=False) == (2.0, True)
+    assert w.nextEdge("clk", 3.5) == (float("inf"), False)
+
+    assert [t for (index, t) in w.iterEdges("clk")] == [1.0, 2.0, 3.5]
+
+
+def test_load_text_range_matches_window(tmp_path):
+    rng = numpy.random.default_rng(491)
+    times = numpy.cumsum(rng.integers(1, 50, 2000)) / 100
+    clk = (numpy.arange(2000) // 37) & 1
+    bus = numpy.where(rng.random(2000) < 0.05, rng.integers(0, 256, 2000), 3)
+
+    path = tmp_path / "range.txt"
+    with open(path, "w") as f:
+        f.write("2000\nclk\tbus\n1\t8\n")
+        for row in zip(times.tolist(), clk.tolist(), bus.tolist()):
+            f.write("{}\t{}\t{}\n".format(*row))
+
+    w = Waves()
+    with open(path) as f:
+        w.loadTextStream(f)
+
+    end = float(times[-1])
+    ranges = [(0, 1), (0, end + 1), (float(times[500]), float(times[900])), (end, end + 1)]
+    ranges += [tuple(sorted(rng.uniform(0, end + 1, 2).tolist())) for i in range(40)]
+    for t0, t1 in ranges:
+        v = Waves()
+        v.loadTextRange(path, t0, t1, stride=64)
+        assert v.toText() == w.window(t0, t1).toText(), (t0, t1)
+
+
+def test_append_and_extend():
+    w = load(CAPTURE)
+
+    # signals left out keep their value from the previous row
+    w.append(10, {"clk": 0})
+    assert w.row(-1) == (10.0, {"clk": 0, "bus": 7})
+    assert w.nextEdge("clk", 9) == (10.0, True)
+
+    w.extend([(11, {"bus": 1}), (12, {"clk": 1, "bus": 2})])
+    assert w.samples() == 9
+    assert w.signalAt("bus", 11.5) == 1
+
+    w.extendColumns([13, 14], {"clk": [0, 1], "bus": [3, 4]})
+    assert w.row(-1) == (14.0, {"clk": 1, "bus": 4})
+
+    with pytest.raises(ValueError, match="not after the previous timestamp"):
+        w.append(14, {"clk": 0})
+
+    # nothing is appended if any row is rejected
+    with pytest.raises(ValueError, match="strictly increasing"):
+        w.extend([(15, {"clk": 0}), (15, {"clk": 1})])
+    with pytest.raises(KeyError, match="Unknown signal 'nope'"):
+        w.extend([(15, {"clk": 0}), (16, {"nope": 1})])
+    assert w.samples() == 11
+
+
+@pytest.mark.parametrize("text, message", [
+    ("3\na\n1\n0\t0\t1\n", "On line 4, line must contain 2 components, but has 3"),
+    ("3\na\n1\n1\t0\n# comment\n0.5\t1\n", "On line 6, timestamp 0.5 moves backwards"),
+    ("3\na\n1\n-1\t0\n", "On line 4, timestamp -1.0 is negative"),
+    ("3\na\n1\nx\t0\n", "On line 4, failed to parse timestamp 'x'"),
+    ("3\na\n1\n0\tq\n", "On line 4, failed to parse signal value for signal 'a'"),
+    ("3\na\tb\n1\n", r"Number of signals \(2\) must match number of signal widths \(1\)"),
+])
+def test_text_errors(text, message):
+    with pytest.raises(ValueError, match=message):
+        load(text)
+
+
+def test_query_errors(tmp_path):
+    w = load(CAPTURE)
+
+    with pytest.raises(KeyError, match="Unknown signal 'x'"):
+        w.signalAt("x", 1)
+    with pytest.raises(ValueError, match="Time cannot be negative"):
+        w.signalAt("clk", -1)
+    with pytest.raises(ValueError, match="Window end 1 is before its start 2"):
+        w.window(2, 1)
+
+    path = tmp_path / "bad.wvb"
+    path.write_bytes(b"NOTWAVES" + bytes(40))
+    with pytest.raises(ValueError, match="Not a binary wave file"):
+        Waves().loadBinary(path)
@@ -0,0 +1,128 @@
+# Copyright 2021 Jason Bakos, Philip Conrad, Charles Daniels
+#
+# Distributed as part of the University of South Carolina CSCE491 course
+# materials. Please do not redistribute without written authorization.
+
+# This file decodes captures of SPI traffic in the format used by the SPI lab,
+# and prints the transactions in them in the format of the expected output of
+# the test cases. It is an example of the bulk edge primitives of Waves:
+# sampleOnEdges() samples the data lines on every clock edge in one pass, and
+# iterEdges() lists the edges of the slave select, instead of nextEdge() and
+# signalAt() being called once per edge. The original version of waves.py,
+# which graded code must work with (see utils/README.md), has neither of them,
+# so code/main.py does not use them.
+#
+# Run it with 'python3 spidecode.py FILE', where FILE is a capture in the text
+# or binary format, see --help for the options.
+
+import argparse
+import sys
+
+import numpy
+
+from waves import Waves
+
+# Each byte as two lowercase hex digits, as printed in the expected output.
+_HEX = ["{:02x}".format(v) for v in range(256)]
+
+
+def exchanges(w: Waves):
+    """exchanges.
+
+    Find the bytes exchanged in a capture. The slave select "ss" is active
+    low. While it is active, "mosi" and "miso" are sampled on the clock edges
+    selected by the initial values of "cpol" and "cpha", and the bits are
+    grouped into bytes, most significant bit first. Bits left over at the end
+    of an active period which do not make up a whole byte are dropped.
+
+    :param w: the capture.
+    :type w: Waves
+    :returns: arrays of the bytes sent on MOSI and on MISO, with an entry per
+        exchange.
+    :rtype: tuple[numpy.ndarray, numpy.ndarray]
+    :raises KeyError: if a signal is missing from the capture.
+    """
+
+    if w.samples() < 1:
+        return numpy.zeros(0, dtype=numpy.uint8), numpy.zeros(0, dtype=numpy.uint8)
+
+    # data is sampled on rising edges of the clock in modes 0 and 3, and on
+    # falling edges in modes 1 and 2
+    initial = w.row(0)[1]
+    rising = (initial["cpol"] & 1) == (initial["cpha"] & 1)
+    times, bits = w.sampleOnEdges("sclk", ["mosi", "miso"], posedge=rising, negedge=not rising, gate=("ss", 0))
+
+    # number each edge with the active period it is in, which starts at the
+    # last falling edge of the slave select before it
+    starts = numpy.array([t for (index, t) in w.iterEdges("ss", posedge=False)], dtype=numpy.float64)
+    period = starts.searchsorted(times, side="right")
+
+    # keep the bits of the whole bytes at the start of each period
+    first = numpy.flatnonzero(numpy.diff(period, prepend=-1))
+    counts = numpy.diff(first, append=len(period))
+    position = numpy.arange(len(period)) - numpy.repeat(first, counts)
+    keep = position < numpy.repeat(counts - counts % 8, counts)
+
+    return (numpy.packbits(bits["mosi"][keep] & 1),
+            numpy.packbits(bits["miso"][keep] & 1))
+
+
+def transactions(mosi, miso) -> list:
+    """transactions.
+
+    Interpret exchanged bytes as the transactions of the lab's protocol. The
+    first byte sent on MOSI holds an address in its upper six bits, then a
+    write flag, then a stream flag. A normal transaction has one more byte,
+    the value written on MOSI or read on MISO. A streaming one is followed by
+    a length byte on MOSI and then that many values. A transaction cut short
+    by the end of the capture reports the values it has.
+
+    :param mosi: bytes sent on MOSI.
+    :type mosi: numpy.ndarray
+    :param miso: bytes sent on MISO, with the same length as mosi.
+    :type miso: numpy.ndarray
+    :returns: a line of text for each transaction.
+    :rtype: list[str]
+    """
+
+    mosi = mosi.tolist()
+    miso = miso.tolist()
+
+    lines = []
+    i = 0
+    while i + 1 < len(mosi):
+        address = mosi[i] >> 2
+        write = (mosi[i] >> 1) & 1
+        values = mosi if write else miso
+        kind = "WR" if write else "RD"
+
+        if (mosi[i] & 1) == 0:
+            lines.append("{} {} {}".format(kind, _HEX[address], _HEX[values[i + 1]]))
+            i += 2
+            continue
+
+        end = min(i + 2 + mosi[i + 1], len(mosi))
+        lines.append("{} STREAM {} {}".format(kind, _HEX[address], " ".join(_HEX[v] for v in values[i + 2:end])))
+        i = end
+
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser("Decode the transactions in an SPI capture.")
+    parser.add_argument("file", help="Capture to decode, in the text format (which may be gzip-compressed) or the binary format.")
+    args = parser.parse_args()
+
+    try:
+        w = Waves.fromFile(args.file)
+        mosi, miso = exchanges(w)
+    except (OSError, ValueError, KeyError) as e:
+        sys.stderr.write("{}: {}\n".format(args.file, e))
+        sys.exit(1)
+
+    for line in transactions(mosi, miso):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+# Copyright 2021 Jason Bakos, Philip Conrad, Charles Daniels
+#
+# Distributed as part of the University of South Carolina CSCE491 course
+# materials. Please do not redistribute without written authorization.
+
+# This file generates synthetic captures of SPI traffic in the format used by
+# the SPI lab, along with the output which a correct decoder produces for them,
+# for use as large load and stress test inputs. Every array is built with
+# vectorized numpy operations, so captures of tens of millions of rows take
+# seconds to generate.
+#
+# Run it with 'python3 spigen.py DIRECTORY' to write a test case directory
+# which the grader can use, see --help for the options.
+
+import argparse
+import os
+import sys
+
+import numpy
+
+from waves import Waves
+
+# Signals of a capture, in the order used by the test cases.
+SIGNALS = ["sclk", "mosi", "miso", "ss", "cpol", "cpha"]
+
+# Each byte as two lowercase hex digits, as printed in the expected output.
+_HEX = ["{:02x}".format(v) for v in range(256)]
+
+
+def _transactions(rng, count: int, stream: float, maxStream: int):
+    """_transactions.
+
+    Draw random transactions, and lay out the bytes exchanged in them.
+
+    :param rng: numpy random generator.
+    :param count: number of transactions.
+    :type count: int
+    :param stream: probability that a transaction is a streaming one.
+    :type stream: float
+    :param maxStream: largest number of values in a streaming transaction.
+    :type maxStream: int
+    :returns: a dict of arrays with an entry per transaction ("address",
+        "write", "stream", "length", "start" and "bytes", the index of its
+        first byte and its number of bytes), and the arrays of bytes sent on
+        MOSI and MISO.
+    :rtype: tuple[dict, numpy.ndarray, numpy.ndarray]
+    """
+
+    address = rng.integers(0, 64, count)
+    write = rng.random(count) < 0.5
+    streaming = rng.random(count) < stream
+    length = numpy.where(streaming, rng.integers(1, maxStream + 1, count), 0)
+
+    # a command byte, then either one data byte, or a length byte followed
+    # by that many data bytes
+    nbytes = numpy.where(streaming, 2 + length, 2)
+    start = numpy.concatenate([[0], numpy.cumsum(nbytes)[:-1]]).astype(numpy.int64)
+
+    owner = numpy.repeat(numpy.arange(count), nbytes)
+    position = numpy.arange(len(owner)) - start[owner]
+    data = rng.integers(0, 256, len(owner))
+
+    command = position == 0
+    lengthByte = streaming[owner] & (position == 1)
+    payload = ~command & ~lengthByte
+    written = write[owner]
+
+    mosi = numpy.where(command, (address << 2)[owner] | (write.astype(numpy.int64) << 1)[owner] | streaming[owner],
+            numpy.where(lengthByte, length[owner],
+            numpy.where(written, data, 0)))
+    miso = numpy.where(payload & ~written, data, 0)
+
+    transactions = {
+        "address": address,
+        "write": write,
+        "stream": streaming,
+        "length": length,
+        "start": start,
+        "bytes": nbytes,
+    }
+    return transactions, mosi.astype(numpy.uint8), miso.astype(numpy.uint8)
+
+
+def expectedOutput(transactions: dict, mosi, miso) -> list:
+    """expectedOutput.
+
+    :param transactions: transactions as returned by _transactions().
+    :type transactions: dict
+    :param mosi: bytes sent on MOSI.
+    :param miso: bytes sent on MISO.
+    :returns: the lines which a correct decoder outputs for the transactions,
+        in the "WR aa dd" and "RD STREAM aa dd dd ..." formats.
+    :rtype: list[str]
+    """
+
+    lines = []
+    for address, write, stream, start, nbytes in zip(
+            transactions["address"].tolist(), transactions["write"].tolist(), transactions["stream"].tolist(),
+            transactions["start"].tolist(), transactions["bytes"].tolist()):
+        values = mosi if write else miso
+        first = start + (2 if stream else 1)
+        words = ["WR" if write else "RD"]
+        if stream:
+            words.append("STREAM")
+        words.append(_HEX[address])
+        words += [_HEX[v] for v in values[first:start + nbytes].tolist()]
+        lines.append(" ".join(words))
+
+    return lines
+
+
+def generate(transactions: int=None, rows: int=None, cpol: int=0, cpha: int=0, stream: float=0.5, maxStream: int=32,
+        jitter: float=0.0, halfPeriod: float=50.0, decimals: int=3, seed=None):
+    """generate.
+
+    Generate a capture of SPI traffic, in which each transaction is sent in a
+    chip select window of its own, MSB first, in the given SPI mode. Between
+    windows, SS is high and the clock idles at CPOL.
+
+    :param transactions: number of transactions to generate. Exactly one of
+        transactions and rows must be given.
+    :type transactions: int
+    :param rows: approximate number of rows to generate, from which the
+        number of transactions is worked out.
+    :type rows: int
+    :param cpol: clock polarity, 0 or 1.
+    :type cpol: int
+    :param cpha: clock phase, 0 or 1.
+    :type cpha: int
+    :param stream: probability that a transaction is a streaming one.
+    :type stream: float
+    :param maxStream: largest number of values in a streaming transaction,
+        from 1 to 255.
+    :type maxStream: int
+    :param jitter: largest amount by which each clock edge is moved, as a
+        fraction of halfPeriod, from 0 up to but not including 0.5.
+    :type jitter: float
+    :param halfPeriod: time between consecutive clock edges, which is also
+        the setup time from SS falling to the first edge, the hold time from
+        the last edge to SS rising, and half the time SS is high between
+        windows.
+    :type halfPeriod: float
+    :param decimals: number of decimal places to round timestamps to.
+    :type decimals: int
+    :param seed: seed for the random generator.
+    :returns: the capture, and the lines which a correct decoder outputs for
+        it.
+    :rtype: tuple[Waves, list[str]]
+    :raises ValueError: if an argument is out of range, or rounding the
+        timestamps to decimals places makes some of them equal.
+    """
+
+    if (transactions is None) == (rows is None):
+        raise ValueError("Exactly one of transactions and rows must be given")
+    if (cpol not in (0, 1)) or (cpha not in (0, 1)):
+        raise ValueError("CPOL and CPHA must be 0 or 1, got {} and {}".format(cpol, cpha))
+    if not (0 <= jitter < 0.5):
+        raise ValueError("Jitter must be at least 0 and less than 0.5, got {}".format(jitter))
+    if not (1 <= maxStream <= 255):
+        raise ValueError("Streaming transactions must have from 1 to 255 values, got {}".format(maxStream))
+
+    rng = numpy.random.default_rng(seed)
+
+    if transactions is None:
+        # each byte takes 16 rows, one per clock edge, and each window 2 more
+        perTransaction = 16 * (2 + stream * (maxStream + 1) / 2) + 2
+        transactions = max(1, int(round(rows / perTransaction)))
+
+    txns, mosiBytes, misoBytes = _transactions(rng, transactions, stream, maxStream)
+    mosiBits = numpy.unpackbits(mosiBytes)
+    misoBits = numpy.unpackbits(misoBytes)
+
+    # Each window has a row at which SS falls, a row per clock edge, and a
+    # row at which SS rises. Row 0 is the idle bus before the first window.
+    edges = 16 * txns["bytes"]
+    windowRows = edges + 2
+    owner = numpy.repeat(numpy.arange(transactions), windowRows)
+    position = numpy.arange(len(owner)) - numpy.repeat(numpy.cumsum(windowRows) - windowRows, windowRows)
+    edge = position - 1
+    isEdge = (position >= 1) & (position <= edges[owner])
+    isRise = position == edges[owner] + 1
+
+    # window start times, and the offset of each row within its window
+    windowLength = (edges + 3) * halfPeriod
+    windowStart = 2 * halfPeriod + numpy.concatenate([[0.0], numpy.cumsum(windowLength)[:-1]])
+    offset = position * halfPeriod
+    if jitter > 0:
+        offset = offset + numpy.where(isEdge, rng.uniform(-jitter, jitter, len(owner)) * halfPeriod, 0.0)
+    times = numpy.round(windowStart[owner] + offset, decimals)
+    if not (times[1:] > times[:-1]).all():
+        raise ValueError("Rounding timestamps to {} decimal places makes some of them equal, use more".format(decimals))
+
+    # The clock leaves idle on even edges and returns on odd ones. Bit i is
+    # put on the bus before leading edge 2i with CPHA 0, and on leading edge
+    # 2i with CPHA 1, so the data lines change on the other edge from the
+    # one they are sampled on.
+    sclk = numpy.where(isEdge & (edge % 2 == 0), 1 - cpol, cpol)
+    if cpha == 0:
+        bit = numpy.minimum(numpy.where(isEdge, (edge + 1) // 2, 0), 8 * txns["bytes"][owner] - 1)
+        driven = ~isRise
+    else:
+        bit = numpy.where(isEdge, edge // 2, 0)
+        driven = isEdge
+    bit = bit + 8 * txns["start"][owner]
+    mosi = numpy.where(driven, mosiBits[bit], 0)
+    miso = numpy.where(driven, misoBits[bit], 0)
+    ss = isRise.astype(numpy.uint8)
+
+    count = len(owner) + 1
+    w = Waves()
+    w.sizes = {s: 1 for s in SIGNALS}
+    w.extendColumns(
+            numpy.concatenate([[0.0], times]),
+            {
+                "sclk": numpy.concatenate([[cpol], sclk]),
+                "mosi": numpy.concatenate([[0], mosi]),
+                "miso": numpy.concatenate([[0], miso]),
+                "ss": numpy.concatenate([[1], ss]),
+                "cpol": numpy.full(count, cpol),
+                "cpha": numpy.full(count, cpha),
+            })
+
+    return w, expectedOutput(txns, mosiBytes, misoBytes)
+
+
+def writeCase(directory, waves, lines: list, category: str="generated", weight: float=1.0):
+    """writeCase.
+
+    Write a capture and its expected output as a test case directory, in the
+    layout the grader reads.
+
+    :param directory: Path to the directory, which is created if it does not
+        exist.
+    :param waves: The capture, written to input.txt.
+    :type waves: Waves
+    :param lines: The expected output, written to output.txt.
+    :type lines: list[str]
+    :param category: The rubric category, written to category.txt.
+    :type category: str
+    :param weight: The weight of the test case, written to weight.txt.
+    :type weight: float
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "input.txt"), "w") as f:
+        waves.writeText(f)
+    with open(os.path.join(directory, "output.txt"), "w") as f:
+        f.write("".join(line + "\n" for line in lines))
+    with open(os.path.join(directory, "category.txt"), "w") as f:
+        f.write(category + "\n")
+    with open(os.path.join(directory, "weight.txt"), "w") as f:
+        f.write("{}\n".format(weight))
+
+
+def main():
+    parser = argparse.ArgumentParser("Generate a synthetic SPI test case.")
+    parser.add_argument("directory", help="Test case directory to write.")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--rows", "-r", type=float, help="Approximate number of rows to generate, for example 1e7.")
+    size.add_argument("--transactions", "-n", type=int, help="Number of transactions to generate. (default: 100)")
+    parser.add_argument("--cpol", type=int, choices=[0, 1], default=0, help="Clock polarity. (default: 0)")
+    parser.add_argument("--cpha", type=int, choices=[0, 1], default=0, help="Clock phase. (default: 0)")
+    parser.add_argument("--stream", type=float, default=0.5, help="Probability that a transaction is a streaming one. (default: 0.5)")
+    parser.add_argument("--max-stream", type=int, default=32, help="Largest number of values in a streaming transaction. (default: 32)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Largest clock edge jitter, as a fraction of the half period. (default: 0)")
+    parser.add_argument("--half-period", type=float, default=50.0, help="Time between clock edges. (default: 50)")
+    parser.add_argument("--decimals", type=int, default=3, help="Number of decimal places to round timestamps to. (default: 3)")
+    parser.add_argument("--seed", type=int, help="Seed for the random generator.")
+    args = parser.parse_args()
+
+    if (args.rows is None) and (args.transactions is None):
+        args.transactions = 100
+
+    try:
+        w, lines = generate(
+                transactions=args.transactions, rows=None if args.rows is None else int(args.rows),
+                cpol=args.cpol, cpha=args.cpha, stream=args.stream, maxStream=args.max_stream,
+                jitter=args.jitter, halfPeriod=args.half_period, decimals=args.decimals, seed=args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    writeCase(args.directory, w, lines, category="generated cpol={} cpha={}".format(args.cpol, args.cpha))
+    sys.stderr.write("wrote {} rows and {} transactions to {}\n".format(w.samples(), len(lines), args.directory))
+
+
+if __name__ == "__main__":
+    main()
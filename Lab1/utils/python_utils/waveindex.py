@@ -0,0 +1,48 @@
+# Copyright 2021 Jason Bakos, Philip Conrad, Charles Daniels
+#
+# Distributed as part of the University of South Carolina CSCE491 course
+# materials. Please do not redistribute without written authorization.
+
+# This file builds the sidecar seek indices which Waves.loadTextRange() uses to
+# load part of a large text capture without parsing all of it. Each index is
+# written next to its capture, with ".wvi" appended to the name.
+#
+# Run it with 'python3 waveindex.py FILE...', see --help for the options.
+# loadTextRange() builds a missing or out of date index itself, so this is only
+# needed to build indices ahead of time, or with a different stride.
+
+import argparse
+import os
+import sys
+import time
+
+from waves import Waves
+
+
+def main():
+    parser = argparse.ArgumentParser("Build seek indices for text wave files.")
+    parser.add_argument("files", nargs="+", help="Text wave files to index, which must not be compressed.")
+    parser.add_argument("--stride", "-s", type=int, default=4096, help="Number of rows between checkpoints. Smaller strides make loading a range faster, and the index larger. (default: 4096)")
+    args = parser.parse_args()
+
+    if args.stride < 1:
+        parser.error("stride must be at least 1, got {}".format(args.stride))
+
+    failed = 0
+    for path in args.files:
+        start = time.perf_counter()
+        try:
+            index = Waves.buildTextIndex(path, args.stride)
+        except (OSError, ValueError) as e:
+            sys.stderr.write("{}: {}\n".format(path, e))
+            failed += 1
+            continue
+
+        sys.stderr.write("wrote {} ({} bytes) in {:.2f} s\n".format(index, os.path.getsize(index), time.perf_counter() - start))
+
+    if failed > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,23 @@
 # This file implements a library which can be used to interact with waves
 # in the format prescribed for the CSCE491 labs.
 
-# https://github.com/Nic30/pyDigitalWaveTools
-from pyDigitalWaveTools.vcd.parser import VcdParser
-from pyDigitalWaveTools.vcd.writer import VcdWriter
-from pyDigitalWaveTools.vcd.common import VCD_SIG_TYPE
-from pyDigitalWaveTools.vcd.value_format import VcdBitsFormatter
-
 from io import StringIO
+import io
+import os
+import sys
+import atexit
+import functools
+import gzip
+import mmap
+import struct
+import math
+import time
 import datetime
+import hashlib
+import threading
+import weakref
+
+import numpy
 
 # https://github.com/Nic30/pyDigitalWaveTools/blob/ab0b89c4a6710c24da68de0e991e6183c056e888/tests/vcdWriter_test.py#L20
 class MaskedValue():
@@ -23,35 +32,2941 @@ class MaskedValue():
         self.vld_mask = vld_mask
 
 
-class Waves:
-    """Waves.
+def _dtypeForWidth(width: int):
+    """_dtypeForWidth.
 
-    This object represents a collection of zero or more waves, which are
-    assumed to be digital signals of not more than 64 bits each in width, which
-    are sampled at various points in time.
+    Select the narrowest unsigned numpy dtype that can hold a signal of the
+    given width in bits. Signals wider than 64 bits are stored as Python
+    integers in an object array.
+
+    :param width: signal width in bits.
+    :type width: int
+    """
+
+    if width <= 8:
+        return numpy.uint8
+    elif width <= 16:
+        return numpy.uint16
+    elif width <= 32:
+        return numpy.uint32
+    elif width <= 64:
+        return numpy.uint64
+    else:
+        return object
+
+
+def _widthMask(width: int) -> int:
+    """_widthMask.
+
+    :param width: signal width in bits.
+    :type width: int
+    :returns: an integer with the lowest width bits set.
+    :rtype: int
+    """
+
+    return (1 << width) - 1
+
+
+def _toColumn(values, width: int):
+    """_toColumn.
+
+    Convert a sequence of signal values into a column array of the dtype
+    chosen by _dtypeForWidth().
+
+    Values are stored as given, not masked to the signal's width, so that
+    toText() and the data property return them unchanged, as they always
+    have; signalAt() and the other sampling methods mask them. If any value
+    does not fit in the signal's width, the column holds int64 values if they
+    all fit in one, or Python integers otherwise.
+
+    :param values: sequence or array of integer signal values.
+    :param width: signal width in bits.
+    :type width: int
+    :rtype: numpy.ndarray
+    """
+
+    dtype = _dtypeForWidth(width)
+    mask = _widthMask(width)
+
+    if dtype is not object:
+        try:
+            arr = numpy.asarray(values)
+        except OverflowError:
+            arr = None
+
+        if (arr is not None) and (arr.dtype.kind in "uib"):
+            if (arr.size == 0) or ((arr.min() >= 0) and (int(arr.max()) <= mask)):
+                return arr.astype(dtype)
+            if (arr.dtype.kind != "u") or (int(arr.max()) < 1 << 63):
+                return arr.astype(numpy.int64)
+            return arr.astype(object)
+
+    values = [int(v) for v in values]
+    if (dtype is not object) and all([0 <= v <= mask for v in values]):
+        return numpy.array(values, dtype=dtype)
+    if (dtype is not object) and all([-(1 << 63) <= v < (1 << 63) for v in values]):
+        return numpy.array(values, dtype=numpy.int64)
+    return numpy.array(values, dtype=object)
+
+
+def _maskColumn(values, width: int):
+    """_maskColumn.
+
+    :param values: array of signal values, as stored by _toColumn().
+    :param width: signal width in bits.
+    :type width: int
+    :returns: the values masked to the signal's width, in the dtype chosen by
+        _dtypeForWidth(). This is values itself if they already fit.
+    :rtype: numpy.ndarray
+    """
+
+    dtype = numpy.dtype(_dtypeForWidth(width))
+    mask = _widthMask(width)
+
+    if (values.dtype == dtype) and (dtype != object):
+        return values
+
+    if values.dtype == object:
+        return numpy.array([int(v) & mask for v in values.tolist()], dtype=dtype).reshape(values.shape)
+
+    # casting to uint64 keeps the two's complement bits of negative values,
+    # matching what Python's & does with the mask
+    return (values.astype(numpy.uint64) & numpy.uint64(mask)).astype(dtype)
+
+
+def _columnDtype(dtypes: list):
+    """_columnDtype.
+
+    :param dtypes: dtypes of column arrays.
+    :type dtypes: list
+    :returns: the dtype which can hold the values of all of them exactly. This
+        is object if numpy would otherwise choose a float, as it does for
+        uint64 and int64.
+    """
+
+    dtype = numpy.result_type(*dtypes)
+    if dtype.kind in "ui":
+        return dtype
+    return numpy.dtype(object)
+
+
+def _concatArrays(arrays: list, dtype):
+    """_concatArrays.
+
+    :param arrays: list of column arrays, whose dtypes may differ.
+    :param dtype: the dtype of the result if arrays is empty.
+    :returns: the arrays concatenated, in a dtype which holds all of their
+        values exactly (see _columnDtype()).
+    :rtype: numpy.ndarray
+    """
+
+    if len(arrays) == 0:
+        return numpy.zeros(0, dtype=dtype)
+
+    common = _columnDtype([a.dtype for a in arrays])
+    return numpy.concatenate([a.astype(common, copy=False) for a in arrays])
+
+
+# Timestamps are stored as int64 ticks. The time of a tick is tick / 10**digits,
+# where digits is the number of decimal places the timestamps of a Waves object
+# need, up to _MAX_DIGITS. Ticks are kept below 2**53 either side of 0, so both
+# they and the powers of ten are exact floats, and dividing one by the other
+# rounds the same way float() does on the equivalent decimal string: the times
+# of ticks are the same floats as the timestamps they were made from.
+#
+# Timestamps which have no such exact ticks, such as floats printed with full
+# precision, or very large or very small times, are stored with digits set to
+# _FLOAT_TICKS instead. Each tick then holds the bits of the float64 timestamp,
+# negated for negative times, so that ticks compare as integers the same way as
+# the timestamps do as floats.
+_MAX_DIGITS = 18
+
+# 10**k as floats, for each possible number of digits.
+_TICK_SCALES = [10.0 ** k for k in range(_MAX_DIGITS + 1)]
+
+# Decimal ticks are always strictly less than this in magnitude, and times
+# beyond it either side of 0 are clamped to it.
+_TICK_LIMIT = 1 << 53
+
+# The digits of Waves objects whose ticks are the bits of their timestamps.
+_FLOAT_TICKS = -1
+
+# Masks of the sign bit and of the rest of the bits of a float64.
+_SIGN_BIT = numpy.int64(-1 << 63)
+_MAGNITUDE_BITS = numpy.int64((1 << 63) - 1)
+
+# Packs a float64 the same way as its int64 bits, to convert single times to
+# float ticks without building arrays.
+_DOUBLE = struct.Struct("<d")
+_INT64 = struct.Struct("<q")
+
+
+def _digitsOfTimes(times, digits: int=0) -> int:
+    """_digitsOfTimes.
+
+    :param times: array-like of float timestamps.
+    :param digits: the fewest digits to consider, or _FLOAT_TICKS.
+    :type digits: int
+    :returns: the number of decimal places, at least digits, with which every
+        time can be represented exactly as a tick, or _FLOAT_TICKS if there is
+        no such number or digits is _FLOAT_TICKS.
+    :rtype: int
+    :raises ValueError: if a time is NaN.
+    """
+
+    times = numpy.asarray(times, dtype=numpy.float64)
+    if numpy.isnan(times).any():
+        raise ValueError("Timestamps cannot be NaN")
+
+    if (times.size == 0) or (digits == _FLOAT_TICKS):
+        return digits
+
+    largest = float(numpy.abs(times).max())
+    if math.isinf(largest):
+        return _FLOAT_TICKS
+
+    for k in range(digits, _MAX_DIGITS + 1):
+        scale = _TICK_SCALES[k]
+        if not (numpy.rint(largest * scale) < _TICK_LIMIT):
+            break
+        if (numpy.rint(times * scale) / scale == times).all():
+            return k
+
+    return _FLOAT_TICKS
+
+
+def _ticksFromTimes(times, digits: int):
+    """_ticksFromTimes.
+
+    :param times: array-like of float timestamps.
+    :param digits: number of decimal places per tick, or _FLOAT_TICKS.
+    :type digits: int
+    :returns: the nearest tick to each time. Float ticks of non-negative
+        float64 arrays are views of them rather than copies.
+    :rtype: numpy.ndarray
+    :raises ValueError: if a time is beyond the range of decimal ticks.
+    """
+
+    times = numpy.asarray(times, dtype=numpy.float64)
+    if digits == _FLOAT_TICKS:
+        bits = numpy.ascontiguousarray(times).view(numpy.int64)
+        if (bits < 0).any():
+            bits = numpy.where(bits < 0, -(bits & _MAGNITUDE_BITS), bits)
+        return bits
+
+    ticks = numpy.rint(times * _TICK_SCALES[digits])
+    if (ticks.size > 0) and not (numpy.abs(ticks).max() < _TICK_LIMIT):
+        raise ValueError("Timestamps must be less than {} in magnitude to be stored with {} decimal places".format(_TICK_LIMIT / _TICK_SCALES[digits], digits))
+    return ticks.astype(numpy.int64)
+
+
+def _timesFromTicks(ticks, digits: int):
+    """_timesFromTicks.
+
+    :param ticks: array of ticks, or a single tick.
+    :param digits: number of decimal places per tick, or _FLOAT_TICKS.
+    :type digits: int
+    :returns: the float time of each tick.
+    :rtype: numpy.ndarray
+    """
+
+    if digits == _FLOAT_TICKS:
+        ticks = numpy.asarray(ticks, dtype=numpy.int64)
+        return numpy.where(ticks < 0, -ticks | _SIGN_BIT, ticks).view(numpy.float64)[()]
+
+    return ticks / _TICK_SCALES[digits]
+
+
+def _rescaleTicks(ticks, digits: int, newDigits: int):
+    """_rescaleTicks.
+
+    :param ticks: array of ticks.
+    :param digits: number of decimal places per tick, or _FLOAT_TICKS.
+    :type digits: int
+    :param newDigits: number of decimal places to convert to, which is either
+        _FLOAT_TICKS or at least digits, and with which every tick's time is
+        exactly representable (see _digitsOfTimes()).
+    :type newDigits: int
+    :returns: the same times as ticks with newDigits decimal places.
+    :rtype: numpy.ndarray
+    """
+
+    if newDigits == digits:
+        return ticks
+    if newDigits == _FLOAT_TICKS:
+        return _ticksFromTimes(_timesFromTicks(ticks, digits), newDigits)
+    return ticks * (10 ** (newDigits - digits))
+
+
+def _tickAtOrBefore(time: float, digits: int) -> int:
+    """_tickAtOrBefore.
+
+    :param time: a float time.
+    :type time: float
+    :param digits: number of decimal places per tick, or _FLOAT_TICKS.
+    :type digits: int
+    :returns: the largest tick whose time is less than or equal to time.
+    :rtype: int
+    """
+
+    if digits == _FLOAT_TICKS:
+        bits = _INT64.unpack(_DOUBLE.pack(time))[0]
+        return bits if bits >= 0 else -(bits & ((1 << 63) - 1))
+
+    scale = _TICK_SCALES[digits]
+    if not (abs(time) * scale < _TICK_LIMIT):
+        return _TICK_LIMIT if time > 0 else -_TICK_LIMIT
+
+    # the product may be rounded either way, and near _TICK_LIMIT adjacent
+    # ticks can have the same time, so the floor of it may be off by one or
+    # two
+    tick = math.floor(time * scale)
+    while tick / scale > time:
+        tick -= 1
+    while (tick + 1) / scale <= time:
+        tick += 1
+    return tick
+
+
+def _ticksAtOrBefore(times, digits: int):
+    """_ticksAtOrBefore.
+
+    Vectorized form of _tickAtOrBefore().
+
+    :param times: array-like of float times.
+    :param digits: number of decimal places per tick, or _FLOAT_TICKS.
+    :type digits: int
+    :rtype: numpy.ndarray
+    """
+
+    times = numpy.asarray(times, dtype=numpy.float64)
+    if digits == _FLOAT_TICKS:
+        return _ticksFromTimes(times, digits)
+
+    scale = _TICK_SCALES[digits]
+    ticks = numpy.clip(numpy.floor(times * scale), -_TICK_LIMIT, _TICK_LIMIT).astype(numpy.int64)
+    ticks -= (ticks / scale > times)
+    for i in range(2):
+        ticks += ((ticks + 1) / scale <= times)
+    return ticks
+
+
+# The binary wave format, which is written by Waves.saveBinary() and read by
+# Waves.loadBinary(), stores the same data as the text format in a form which
+# can be memory-mapped and used in place. All integers are little-endian.
+#
+#   offset  size  field
+#   0       8     magic number, the ASCII bytes "WAVESBIN"
+#   8       4     format version (uint32), currently 2
+#   12      4     number of signals N (uint32)
+#   16      8     number of samples S (uint64)
+#   24      4     number of decimal places D of the timestamps (uint32)
+#   28      4     reserved, 0
+#   32      ...   signal table, N entries of:
+#                   4  signal width in bits (uint32), 1 to 64
+#                   4  length L of the signal name in bytes (uint32)
+#                   L  signal name, UTF-8, not NUL terminated
+#
+# The signal table is followed by N+1 arrays, each of which starts at the next
+# offset which is a multiple of 64 bytes, with zero padding in between:
+#
+#   * S timestamps, as int64 ticks of 10**-D, or if D is 0xFFFFFFFF, as IEEE
+#     754 doubles, for captures whose timestamps have no exact decimal ticks
+#   * for each signal, in signal table order, S values, each stored in the
+#     smallest of uint8, uint16, uint32 and uint64 which fits the signal's
+#     width
+#
+# Signal values are always masked to their width.
+#
+# Version 1 files, which are still read, have no D or reserved field, so the
+# signal table starts at offset 24, and store timestamps as IEEE 754 doubles.
+_BINARY_MAGIC = b"WAVESBIN"
+_BINARY_VERSION = 2
+_BINARY_ALIGN = 64
+
+# The value of D in files whose timestamps are stored as doubles.
+_BINARY_FLOAT_DIGITS = 0xFFFFFFFF
+
+
+def _alignUp(offset: int) -> int:
+    """_alignUp.
+
+    :param offset: a byte offset.
+    :type offset: int
+    :returns: the first multiple of _BINARY_ALIGN at or after offset.
+    :rtype: int
+    """
+
+    return (offset + _BINARY_ALIGN - 1) // _BINARY_ALIGN * _BINARY_ALIGN
+
+
+def _encodeSignalTable(sizes: dict) -> bytes:
+    """_encodeSignalTable.
+
+    :param sizes: dict associating signal names with their widths.
+    :type sizes: dict
+    :returns: the signal table of a binary wave file holding these signals.
+    :rtype: bytes
+    """
+
+    table = []
+    for name in sizes:
+        encoded = name.encode("utf-8")
+        table.append(struct.pack("<II", sizes[name], len(encoded)))
+        table.append(encoded)
+    return b"".join(table)
+
+
+def _decodeSignalTable(view, offset: int, count: int):
+    """_decodeSignalTable.
+
+    :param view: memoryview or bytes holding a signal table.
+    :param offset: byte offset of the signal table.
+    :type offset: int
+    :param count: number of signals in the table.
+    :type count: int
+    :returns: a dict associating signal names with their widths, and the
+        byte offset of the end of the table.
+    :rtype: tuple[dict, int]
+    :raises ValueError: if a signal appears more than once.
+    """
+
+    sizes = {}
+    for i in range(count):
+        width, length = struct.unpack_from("<II", view, offset)
+        offset += 8
+        name = bytes(view[offset:offset+length]).decode("utf-8")
+        offset += length
+        if name in sizes:
+            raise ValueError("Duplicate signal '{}' in signal table".format(name))
+        sizes[name] = width
+    return sizes, offset
+
+
+def _arrayLayout(header: bytes, dtypes: list, count: int):
+    """_arrayLayout.
+
+    Lay out arrays one after another following a header, each starting at
+    the next offset which is a multiple of _BINARY_ALIGN.
+
+    :param header: the encoded header.
+    :type header: bytes
+    :param dtypes: the dtype of each array, in order.
+    :type dtypes: list
+    :param count: number of entries in each array.
+    :type count: int
+    :returns: a list of (offset, dtype) for each array, with the dtypes made
+        little-endian, and the total size.
+    :rtype: tuple[list, int]
+    """
+
+    arrays = []
+    offset = len(header)
+    for dtype in dtypes:
+        dtype = numpy.dtype(dtype).newbyteorder("<")
+        offset = _alignUp(offset)
+        arrays.append((offset, dtype))
+        offset += dtype.itemsize * count
+
+    return arrays, offset
+
+
+def _writeLayout(path, header: bytes, arrays: list, columns: list):
+    """_writeLayout.
+
+    Write a header and arrays laid out by _arrayLayout() to a file, under a
+    temporary name which is then renamed into place, so that readers never
+    see a partly written file.
+
+    :param path: path to the file to write.
+    :param header: the encoded header.
+    :type header: bytes
+    :param arrays: list of (offset, dtype) for each array.
+    :type arrays: list
+    :param columns: the arrays, in the same order.
+    :type columns: list
+    """
+
+    tmp = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp, "wb") as f:
+            f.write(header)
+            position = len(header)
+            for (offset, dtype), values in zip(arrays, columns):
+                f.write(bytes(offset - position))
+                numpy.ascontiguousarray(values, dtype=dtype).tofile(f)
+                position = offset + dtype.itemsize * len(values)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _binaryLayout(sizes: dict, samples: int, digits: int, version: int=_BINARY_VERSION):
+    """_binaryLayout.
+
+    Compute where each part of a binary wave file is stored.
+
+    :param sizes: dict associating signal names with their widths.
+    :type sizes: dict
+    :param samples: number of samples.
+    :type samples: int
+    :param digits: number of decimal places of the timestamps, or
+        _FLOAT_TICKS.
+    :type digits: int
+    :param version: format version of the file.
+    :type version: int
+    :returns: the encoded header (up to the end of the signal table), a list
+        of (offset, dtype) for the timestamp array followed by each signal's
+        column in order, and the total file size.
+    :rtype: tuple[bytes, list, int]
+    """
+
+    header = [_BINARY_MAGIC, struct.pack("<IIQ", version, len(sizes), samples)]
+    timeDtype = numpy.float64
+    if version >= 2:
+        header.append(struct.pack("<II", _BINARY_FLOAT_DIGITS if digits == _FLOAT_TICKS else digits, 0))
+        if digits != _FLOAT_TICKS:
+            timeDtype = numpy.int64
+    for name in sizes:
+        if (sizes[name] < 1) or (sizes[name] > 64):
+            raise ValueError("Signal '{}' has width {}, but the binary format only supports widths from 1 to 64 bits".format(name, sizes[name]))
+    header = b"".join(header) + _encodeSignalTable(sizes)
+
+    arrays, total = _arrayLayout(header, [timeDtype] + [_dtypeForWidth(sizes[name]) for name in sizes], samples)
+    return header, arrays, total
+
+
+def _readBinaryHeader(buffer):
+    """_readBinaryHeader.
+
+    Decode the header of a binary wave file.
+
+    :param buffer: object supporting the buffer protocol which holds the
+        contents of the file.
+    :returns: the sizes dict, the number of samples, the number of decimal
+        places of the timestamps, and the array layout as returned by
+        _binaryLayout(). The number of decimal places is None for version 1
+        files, whose timestamps are stored as floats, and _FLOAT_TICKS for
+        version 2 files which store them as floats.
+    :rtype: tuple[dict, int, int, list]
+    :raises ValueError: if the buffer does not hold a valid binary wave file.
+    """
+
+    view = memoryview(buffer)
+    if (len(view) < 24) or (bytes(view[0:8]) != _BINARY_MAGIC):
+        raise ValueError("Not a binary wave file (bad magic number)")
+
+    version, nsignals, samples = struct.unpack_from("<IIQ", view, 8)
+    if version not in (1, _BINARY_VERSION):
+        raise ValueError("Unsupported binary wave file version {}".format(version))
+
+    digits = None
+    offset = 24
+    if version >= 2:
+        if len(view) < 32:
+            raise ValueError("Binary wave file is truncated, expected at least 32 bytes but got {}".format(len(view)))
+        digits, reserved = struct.unpack_from("<II", view, 24)
+        if digits == _BINARY_FLOAT_DIGITS:
+            digits = _FLOAT_TICKS
+        elif digits > _MAX_DIGITS:
+            raise ValueError("Binary wave file has {} decimal places, but at most {} are supported".format(digits, _MAX_DIGITS))
+        offset = 32
+
+    sizes, offset = _decodeSignalTable(view, offset, nsignals)
+
+    header, arrays, total = _binaryLayout(sizes, samples, digits or 0, version)
+    if len(view) < total:
+        raise ValueError("Binary wave file is truncated, expected {} bytes but got {}".format(total, len(view)))
+
+    return sizes, samples, digits, arrays
+
+
+def _mapShared(name: str):
+    """_mapShared.
+
+    Map a shared memory block created by multiprocessing.shared_memory into
+    this process, read-only.
+
+    This does not use multiprocessing.shared_memory.SharedMemory, which before
+    Python 3.13 registers every block it attaches to with the process's
+    resource tracker, so that the block is destroyed as soon as any process
+    which attached to it exits.
+
+    :param name: the name of the shared memory block.
+    :type name: str
+    :returns: a read-only mmap of the whole block.
+    :rtype: mmap.mmap
+    :raises FileNotFoundError: if there is no shared memory block with the
+        given name.
+    """
+
+    if os.name == "nt":
+        import _winapi
+
+        # The size of a named mapping can only be found by mapping a view of
+        # it, as SharedMemory does.
+        handle = _winapi.OpenFileMapping(_winapi.FILE_MAP_READ, False, name)
+        try:
+            address = _winapi.MapViewOfFile(handle, _winapi.FILE_MAP_READ, 0, 0, 0)
+            try:
+                size = _winapi.VirtualQuerySize(address)
+            finally:
+                _winapi.UnmapViewOfFile(address)
+        finally:
+            _winapi.CloseHandle(handle)
+        return mmap.mmap(-1, size, tagname=name, access=mmap.ACCESS_READ)
+
+    import _posixshmem
+
+    fd = _posixshmem.shm_open("/" + name, os.O_RDONLY, mode=0o600)
+    try:
+        return mmap.mmap(fd, os.fstat(fd).st_size, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+
+def _releaseShared(block):
+    """_releaseShared.
+
+    Destroy a shared memory block created by Waves.toSharedMemory(), if it has
+    not been destroyed already.
+
+    :param block: the block.
+    :type block: multiprocessing.shared_memory.SharedMemory
+    """
+
+    block.close()
+    try:
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _readOnly(array):
+    """_readOnly.
+
+    :param array: a numpy array.
+    :returns: a read-only view of the array.
+    :rtype: numpy.ndarray
+    """
+
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+def _vcdValue(value: str) -> int:
+    """_vcdValue.
+
+    Convert a value from a VCD value change into an integer. Don't-care and
+    high-impedance bits are converted to 0.
+
+    :param value: the value as it appears in the VCD file, for example "1",
+        "b01x0" or "B1010".
+    :type value: str
+    :rtype: int
+    """
+
+    value = value.replace("X", "0")
+    value = value.replace("x", "0")
+    value = value.replace("Z", "0")
+    value = value.replace("z", "0")
+
+    if value[0] in "bB":
+        return int(value[1:], 2)
+
+    return int(value)
+
+
+class _ColumnChunks:
+    """_ColumnChunks.
+
+    Accumulates parsed rows of sample data into column arrays. Rows are
+    buffered in Python lists, which are converted into arrays every
+    chunkRows rows, so that the memory used while parsing stays close to the
+    size of the finished arrays.
+    """
+
+    def __init__(this, signals: list, widths: list, timeDtype=numpy.float64, chunkRows: int=65536):
+        this.signals = signals
+        this.widths = widths
+        this.timeDtype = timeDtype
+        this.chunkRows = chunkRows
+
+        # rows which have not been converted to arrays yet; row values are
+        # appended to columns[i] for the i-th signal
+        this.times = []
+        this.columns = [[] for s in signals]
+
+        # arrays converted so far
+        this.timeChunks = []
+        this.columnChunks = [[] for s in signals]
+
+    def flush(this):
+        """flush.
+
+        Convert all buffered rows into arrays.
+        """
+
+        if len(this.times) == 0:
+            return
+
+        this.timeChunks.append(numpy.array(this.times, dtype=this.timeDtype))
+        for i in range(len(this.signals)):
+            this.columnChunks[i].append(_toColumn(this.columns[i], this.widths[i]))
+            this.columns[i] = []
+        this.times = []
+
+    def fill(this, i: int, value: int):
+        """fill.
+
+        Overwrite the value of one signal in every row accumulated so far.
+
+        :param i: index of the signal.
+        :type i: int
+        :param value: value to write, already masked to the signal's width.
+        :type value: int
+        """
+
+        this.columns[i] = [value] * len(this.columns[i])
+        this.columnChunks[i] = [_toColumn(numpy.full(len(chunk), value), this.widths[i]) for chunk in this.columnChunks[i]]
+
+    def extend(this, timestamps, columns: list):
+        """extend.
+
+        Append several rows at once.
+
+        :param timestamps: array of timestamps of the new rows.
+        :param columns: list holding an array of values for each signal.
+        :type columns: list
+        """
+
+        this.flush()
+        this.timeChunks.append(numpy.asarray(timestamps, dtype=this.timeDtype))
+        for i in range(len(this.signals)):
+            this.columnChunks[i].append(_toColumn(columns[i], this.widths[i]))
+
+    def finish(this):
+        """finish.
+
+        :returns: an array of timestamps of dtype timeDtype, and a dict
+            associating each signal name with its column array.
+        :rtype: tuple[numpy.ndarray, dict]
+        """
+
+        this.flush()
+
+        timestamps = numpy.concatenate([numpy.zeros(0, dtype=this.timeDtype)] + this.timeChunks)
+        columns = {}
+        for i in range(len(this.signals)):
+            columns[this.signals[i]] = _concatArrays(this.columnChunks[i], _dtypeForWidth(this.widths[i]))
+
+        return timestamps, columns
+
+
+# A column is stored as a change list (see _SparseColumn) if doing so takes at
+# most this fraction of the space of storing it densely.
+_SPARSE_RATIO = 0.25
+
+
+class _SparseColumn:
+    """_SparseColumn.
+
+    Change-list encoding of a column, for signals which rarely change. Only
+    the rows at which the value changes are stored, as an array of row
+    indices and an array of the values starting at those rows, much as a VCD
+    file records a signal. The first change is always at row 0, and
+    consecutive values always differ.
+
+    Indexing behaves like indexing the equivalent dense array: an integer
+    or an array of integers looks up values by bisecting the change list, and
+    a slice expands the rows it covers into a new dense array.
+    """
+
+    def __init__(this, changes, values, length: int):
+        """__init__.
+
+        :param changes: sorted int64 array of the row indices at which the
+            value changes, starting with 0.
+        :param values: array of the value from each of those rows onwards.
+        :param length: number of rows in the column.
+        :type length: int
+        """
+
+        this.changes = changes
+        this.values = values
+        this.length = length
+
+    @classmethod
+    def encode(cls, column):
+        """encode.
+
+        :param column: a dense column array.
+        :returns: the change-list encoding of the column if it is sparse enough
+            for that to pay off (see _SPARSE_RATIO), otherwise column itself.
+        """
+
+        if len(column) == 0:
+            return column
+
+        changes = numpy.flatnonzero(column[1:] != column[:-1]) + 1
+        sparseBytes = (len(changes) + 1) * (changes.itemsize + column.itemsize)
+        if sparseBytes > _SPARSE_RATIO * column.nbytes:
+            return column
+
+        changes = numpy.concatenate([numpy.zeros(1, dtype=changes.dtype), changes])
+        return cls(changes.astype(numpy.int64), column[changes], len(column))
+
+    @property
+    def dtype(this):
+        return this.values.dtype
+
+    def __len__(this) -> int:
+        return this.length
+
+    def __getitem__(this, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(this.length)
+            if step != 1:
+                return this.dense(0, this.length)[key]
+            return this.dense(start, stop)
+
+        if isinstance(key, (numpy.ndarray, list)):
+            rows = numpy.asarray(key)
+            rows = numpy.where(rows < 0, rows + this.length, rows)
+            if (rows.size > 0) and ((rows.min() < 0) or (rows.max() >= this.length)):
+                raise IndexError("index out of bounds for column of length {}".format(this.length))
+            return this.values[this.changes.searchsorted(rows, side="right") - 1]
+
+        row = int(key)
+        if row < 0:
+            row += this.length
+        if (row < 0) or (row >= this.length):
+            raise IndexError("index {} out of bounds for column of length {}".format(key, this.length))
+        return this.values[int(this.changes.searchsorted(row, side="right")) - 1]
+
+    def dense(this, start: int, end: int):
+        """dense.
+
+        :param start: index of the first row to expand.
+        :type start: int
+        :param end: index one past the last row to expand.
+        :type end: int
+        :returns: a new dense array of the values in rows [start, end).
+        :rtype: numpy.ndarray
+        """
+
+        if end <= start:
+            return numpy.zeros(0, dtype=this.values.dtype)
+
+        first = int(this.changes.searchsorted(start, side="right")) - 1
+        last = int(this.changes.searchsorted(end, side="left"))
+        bounds = numpy.concatenate([[start], this.changes[first + 1:last], [end]])
+        return numpy.repeat(this.values[first:last], numpy.diff(bounds))
+
+    def window(this, start: int, end: int):
+        """window.
+
+        :param start: index of the first row of the window.
+        :type start: int
+        :param end: index one past the last row of the window.
+        :type end: int
+        :returns: the change-list encoding of rows [start, end), whose values
+            are a read-only view of this column's values.
+        :rtype: _SparseColumn
+        """
+
+        if end <= start:
+            return _SparseColumn(this.changes[:0], _readOnly(this.values[:0]), 0)
+
+        first = int(this.changes.searchsorted(start, side="right")) - 1
+        last = int(this.changes.searchsorted(end, side="left"))
+        changes = this.changes[first:last] - start
+        changes[0] = 0
+        return _SparseColumn(changes, _readOnly(this.values[first:last]), end - start)
+
+    def changedRows(this, start: int, end: int):
+        """changedRows.
+
+        :returns: the indices in [start, end) of the rows whose value differs
+            from that of the previous row.
+        :rtype: numpy.ndarray
+        """
+
+        start = max(start, 1)
+        return this.changes[this.changes.searchsorted(start, side="left"):this.changes.searchsorted(end, side="left")]
+
+    def edges(this):
+        """edges.
+
+        :returns: the row indices of rising edges, and of falling edges, as for
+            Waves._edgeIndex().
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        """
+
+        before, after = this.values[:-1], this.values[1:]
+        return this.changes[1:][before < after], this.changes[1:][before > after]
+
+
+def _windowColumn(column, start: int, end: int):
+    """_windowColumn.
+
+    :param column: a column array, or a _SparseColumn.
+    :returns: a read-only view of rows [start, end) of the column.
+    """
+
+    if isinstance(column, _SparseColumn):
+        return column.window(start, end)
+
+    return _readOnly(column[start:end])
+
+
+def _concatColumns(columns: list, dtype):
+    """_concatColumns.
+
+    :param columns: list of column arrays or _SparseColumns, all holding the
+        same signal.
+    :param dtype: the dtype of the columns.
+    :returns: a column holding the rows of each column in turn, which is a
+        _SparseColumn if all of the columns are, and dense otherwise.
+    """
+
+    columns = [c for c in columns if len(c) > 0]
+    if len(columns) == 0:
+        return numpy.zeros(0, dtype=dtype)
+
+    if not all([isinstance(c, _SparseColumn) for c in columns]):
+        return _concatArrays([c[:] for c in columns], dtype)
+
+    changes = []
+    values = []
+    length = 0
+    for c in columns:
+        # the first entry of each change list after the first one is only
+        # a change if its value differs from where the previous column ended
+        skip = 1 if (length > 0) and (c.values[0] == last) else 0
+        changes.append(c.changes[skip:] + length)
+        values.append(c.values[skip:])
+        length += len(c)
+        last = c.values[-1]
+
+    return _SparseColumn(numpy.concatenate(changes), _concatArrays(values, dtype), length)
+
+
+def _mergeTimestamps(arrays: list):
+    """_mergeTimestamps.
+
+    :param arrays: list of sorted timestamp arrays.
+    :returns: a sorted array of every timestamp in any of the arrays, without
+        duplicates.
+    :rtype: numpy.ndarray
+    """
+
+    # Each array is already sorted, so a stable sort of them all together
+    # merges the sorted runs rather than sorting from scratch.
+    timestamps = numpy.concatenate([numpy.zeros(0, dtype=numpy.float64)] + arrays)
+    timestamps = numpy.sort(timestamps, kind="stable")
+    if len(timestamps) > 1:
+        timestamps = timestamps[numpy.concatenate([[True], timestamps[1:] != timestamps[:-1]])]
+
+    return timestamps
+
+
+class _Growable:
+    """_Growable.
+
+    An array with spare capacity at its end, so that appending to it takes
+    amortized constant time. The capacity is doubled whenever it runs out.
+    """
+
+    def __init__(this, array):
+        """__init__.
+
+        :param array: initial contents, which are copied.
+        :type array: numpy.ndarray
+        """
+
+        this.buffer = numpy.empty(max(16, 2 * len(array)), dtype=array.dtype)
+        this.buffer[:len(array)] = array
+        this.size = len(array)
+
+        # the contents, as a view of the first size entries of buffer
+        this.view = this.buffer[:this.size]
+
+    def extend(this, values):
+        """extend.
+
+        :param values: array of values to append.
+        :returns: a view of the contents after appending.
+        :rtype: numpy.ndarray
+        """
+
+        size = this.size + len(values)
+        if size > len(this.buffer):
+            buffer = numpy.empty(max(2 * len(this.buffer), size), dtype=this.buffer.dtype)
+            buffer[:this.size] = this.buffer[:this.size]
+            this.buffer = buffer
+
+        this.buffer[this.size:size] = values
+        this.size = size
+        this.view = this.buffer[:size]
+        return this.view
+
+
+# The text parser reads its input in blocks of about this many bytes, each of
+# which ends on a line boundary.
+_BLOCK_BYTES = 1 << 22
+
+# Powers of ten, as integers and as (exactly representable) floats.
+_POW10 = numpy.array([10 ** k for k in range(19)], dtype=numpy.int64)
+_POW10F = numpy.array([10.0 ** k for k in range(23)], dtype=numpy.float64)
+
+
+def _textBlocks(text: str, blockBytes: int=_BLOCK_BYTES):
+    """_textBlocks.
+
+    Split text into blocks of UTF-8 encoded bytes for _TextParser, each of
+    which ends on a line boundary.
+
+    :param text: the text to split.
+    :type text: str
+    :param blockBytes: approximate size of each block.
+    :type blockBytes: int
+    """
+
+    data = text.encode("utf-8", "surrogatepass")
+    offset = 0
+    while offset < len(data):
+        cut = data.find(b"\n", offset + blockBytes)
+        if cut < 0:
+            cut = len(data)
+        else:
+            cut += 1
+
+        yield data[offset:cut]
+        offset = cut
+
+
+def _streamBlocks(fileobj, blockBytes: int=_BLOCK_BYTES):
+    """_streamBlocks.
+
+    Read a file object as blocks of UTF-8 encoded bytes for _TextParser, each
+    of which ends on a line boundary. Text mode file objects are read as-is.
+    Binary ones are decompressed first if they start with the gzip magic
+    number. The file object is never closed.
+
+    :param fileobj: a file object opened in text or binary mode.
+    :param blockBytes: approximate size of each block.
+    :type blockBytes: int
+    """
+
+    text = isinstance(fileobj, io.TextIOBase)
+
+    if not text:
+        # sniff the first two bytes without consuming them if we can
+        magic = b""
+        if hasattr(fileobj, "peek"):
+            magic = fileobj.peek(2)[:2]
+        elif hasattr(fileobj, "seekable") and fileobj.seekable():
+            position = fileobj.tell()
+            magic = fileobj.read(2)
+            fileobj.seek(position)
+
+        if magic == b"\x1f\x8b":
+            fileobj = gzip.GzipFile(fileobj=fileobj, mode="rb")
+
+    carry = b""
+    while True:
+        chunk = fileobj.read(blockBytes)
+        if len(chunk) == 0:
+            break
+
+        if text:
+            chunk = chunk.encode("utf-8", "surrogatepass")
+
+        chunk = carry + chunk
+        cut = chunk.rfind(b"\n") + 1
+        if cut == 0:
+            carry = chunk
+            continue
+
+        yield chunk[:cut]
+        carry = chunk[cut:]
+
+    if len(carry) > 0:
+        yield carry
+
+
+def _parseDecimals(data, starts, lengths, fraction: bool):
+    """_parseDecimals.
+
+    Parse a batch of tokens consisting only of ASCII digits, and if fraction
+    is True at most one decimal point, in one vectorized pass.
+
+    The tokens are expected to have already been checked to contain nothing
+    but digits and decimal points. Only tokens which float() or int() would
+    parse to exactly the same value are accepted. In particular integers are
+    limited to 18 digits so they fit an int64, and decimals to 15 significant
+    digits, so that the digits form an exactly representable mantissa which
+    is then divided by an exact power of ten; IEEE division then rounds the
+    same way float() does.
+
+    :param data: uint8 array containing the tokens.
+    :type data: numpy.ndarray
+    :param starts: offset of each token in data, in an array of any shape.
+    :type starts: numpy.ndarray
+    :param lengths: length of each token in bytes, all at least 1, in an
+        array of the same shape as starts.
+    :type lengths: numpy.ndarray
+    :param fraction: if True, parse float64 decimals, otherwise int64
+        integers, or uint8 ones if every token is a single digit.
+    :type fraction: bool
+    :returns: the parsed values, in an array of the same shape as starts, or
+        None if any token cannot be parsed this way.
+    :rtype: numpy.ndarray or None
+    """
+
+    if starts.size == 0:
+        return numpy.zeros(starts.shape, dtype=numpy.float64 if fraction else numpy.int64)
+
+    width = int(lengths.max())
+    if width > 18:
+        return None
+
+    # single digit integers, such as the values of one bit signals, are the
+    # common case, and are just the digit
+    if (width == 1) and not fraction:
+        values = data[starts] - numpy.uint8(ord("0"))
+        if (values > 9).any():
+            return None
+        return values
+
+    # Walk the tokens left to right one character position at a time,
+    # accumulating the digits seen so far with Horner's rule.
+    values = numpy.zeros(starts.shape, dtype=numpy.int64)
+    count = numpy.zeros(starts.shape, dtype=numpy.int64)
+    dots = numpy.zeros(starts.shape, dtype=numpy.int64)
+    decimals = numpy.zeros(starts.shape, dtype=numpy.int64)
+    for position in range(width):
+        inside = position < lengths
+        chars = data[numpy.minimum(starts + position, len(data) - 1)]
+        dot = inside & (chars == ord("."))
+        digit = inside & ~dot
+        values = numpy.where(digit, values * 10 + (chars - ord("0")), values)
+        count += digit
+        if fraction:
+            decimals += digit & (dots > 0)
+        dots += dot
+
+    if fraction:
+        if (dots > 1).any() or (count.max() > 15):
+            return None
+    elif dots.any():
+        return None
+
+    # tokens which are just a decimal point
+    if (count == 0).any():
+        return None
+
+    if not fraction:
+        return values
+
+    return values / _POW10F[decimals]
+
+
+class _TextParser:
+    """_TextParser.
+
+    Parser for the text format used in this course, which is fed the input
+    in blocks of bytes that end on line boundaries.
+
+    The three header lines are parsed one line at a time. Blocks of sample
+    rows are first given to a fast path which tokenizes and converts the
+    whole block with numpy, but which only accepts plain tab separated
+    decimal rows. Any block the fast path does not accept, for example one
+    containing a comment or a syntax error, is parsed again one line at a time
+    by the strict parser, which produces the same line-numbered errors as
+    always.
     """
 
+    def __init__(this, waves):
+        this.waves = waves
+
+        this.linum = 1
+        this.trueline = 1  # lines including comments and empties, just for error messages
+        this.signals = []
+        this.widths = []
+
+        # sample data is accumulated column-wise and stored once parsing is
+        # complete
+        this.rows = None
+        this.previous = None
+
+    def feed(this, data: bytes):
+        """feed.
+
+        Parse a block of input.
+
+        :param data: UTF-8 encoded text, which must end on a line boundary
+            unless it is the last block of the input.
+        :type data: bytes
+        """
+
+        offset = 0
+        while (this.linum <= 3) and (offset < len(data)):
+            end = data.find(b"\n", offset)
+            if end < 0:
+                end = len(data)
+            this.line(data[offset:end].decode("utf-8", "surrogatepass"))
+            offset = end + 1
+
+        if offset >= len(data):
+            return
+
+        body = data[offset:]
+        if this.fast(body):
+            return
+
+        lines = body.split(b"\n")
+        if body.endswith(b"\n"):
+            lines.pop()
+
+        for line in lines:
+            this.line(line.decode("utf-8", "surrogatepass"))
+
+    def finish(this):
+        """finish.
+
+        Store the parsed data into the Waves object being parsed into, if the
+        header was parsed completely.
+        """
+
+        if this.rows is not None:
+            timestamps, columns = this.rows.finish()
+            digits = _digitsOfTimes(timestamps)
+            this.waves._setStorage(_ticksFromTimes(timestamps, digits), digits, columns)
+            this.waves._compact()
+
+    def fast(this, body: bytes) -> bool:
+        """fast.
+
+        Try to parse a block of sample rows in bulk.
+
+        :param body: a block of input which follows the header.
+        :type body: bytes
+        :returns: True if the block was parsed, or False if it was rejected,
+            in which case nothing has been changed.
+        :rtype: bool
+        """
+
+        ncols = 1 + len(this.signals)
+        if (len(this.signals) != len(this.waves.sizes)) or any(w > 64 for w in this.widths):
+            return False
+
+        data = numpy.frombuffer(body, dtype=numpy.uint8)
+        if data[-1] != ord("\n"):
+            data = numpy.append(data, numpy.uint8(ord("\n")))
+
+        # only digits, decimal points, tabs and newlines are accepted; every
+        # other character is either above "9", a "/", or one of the
+        # separators below "." checked next
+        if (data.max() > ord("9")) or (data == ord("/")).any():
+            return False
+
+        # each token runs from just after the previous separator up to the
+        # next one
+        ends = numpy.flatnonzero(data < ord("."))
+        lengths = numpy.diff(ends, prepend=-1)
+        lengths -= 1
+        separators = data[ends]
+        tabbed = separators == ord("\t")
+        lines = len(ends) - int(numpy.count_nonzero(tabbed))
+        if numpy.count_nonzero(separators == ord("\n")) != lines:
+            return False
+
+        # zero length tokens are fine if they are blank lines, but not if
+        # they are empty fields or leading or trailing tabs
+        empty = lengths == 0
+        if empty.any():
+            previous = numpy.zeros_like(tabbed)
+            previous[1:] = tabbed[:-1]
+            if (empty & (tabbed | previous)).any():
+                return False
+
+            keep = ~empty
+            ends, lengths, tabbed = ends[keep], lengths[keep], tabbed[keep]
+
+        # every row must be ncols tokens, all but the last ended by a tab
+        if len(ends) % ncols != 0:
+            return False
+        nrows = len(ends) // ncols
+        tabbed = tabbed.reshape(nrows, ncols)
+        if tabbed[:, -1].any() or not tabbed[:, :-1].all():
+            return False
+        ends = ends.reshape(nrows, ncols)
+        lengths = lengths.reshape(nrows, ncols)
+
+        timestamps = _parseDecimals(data, ends[:, 0] - lengths[:, 0], numpy.ascontiguousarray(lengths[:, 0]), True)
+        if timestamps is None:
+            return False
+
+        if nrows > 0:
+            if (this.previous is not None) and (timestamps[0] <= this.previous):
+                return False
+            # NaN compares false with everything, so it would pass the
+            # ordering checks; the strict parser reports its line
+            if (numpy.diff(timestamps) <= 0).any() or numpy.isnan(timestamps).any():
+                return False
+
+        # the values of every signal are parsed together, in one pass
+        values = _parseDecimals(data, ends[:, 1:] - lengths[:, 1:], lengths[:, 1:], False)
+        if values is None:
+            return False
+        columns = [values[:, i] for i in range(len(this.signals))]
+
+        if nrows > 0:
+            this.rows.extend(timestamps, columns)
+            this.previous = float(timestamps[-1])
+        this.linum += nrows
+        this.trueline += lines
+        return True
+
+    def line(this, line: str):
+        """line.
+
+        Parse a single line of input with the strict parser.
+
+        :param line: the line to parse.
+        :type line: str
+        :raises ValueError: If a syntax error occurs while parsing the line.
+        """
+
+        line = line.strip()
+
+        # ignore comments
+        if (len(line.strip()) >= 1) and (line.strip()[0] == '#'):
+            this.trueline += 1
+            return
+
+        # ignore empty lines
+        if len(line.strip()) == 0:
+            this.trueline += 1
+            return
+
+        if this.linum == 1:
+            # this is just the number of records, we don't need to know
+            # this
+            pass
+
+        elif this.linum == 2:
+            # parse the list of signals
+            for s in line.split("\t"):
+                this.signals.append(s.strip())
+
+        elif this.linum == 3:
+            # parse the signal widths
+            i = 0
+            for w in line.split("\t"):
+                wv = 0
+                w = w.strip()
+                try:
+                    wv = int(w)
+                except Exception as e:
+                    if i < len(this.signals):
+                        raise ValueError("Could not parse signal width '{}' for signal '{}' due to error: '{}'".format(w, this.signals[i], e))
+                    else:
+                        raise ValueError("Could not parse signal width '{}' for out of bounds signal due to error: '{}'".format(w, e))
+
+                this.widths.append(wv)
+
+            if len(this.widths) != len(this.signals):
+                raise ValueError("Number of signals ({}) must match number of signal widths ({})".format(len(this.signals), len(this.widths)))
+
+            this.waves.sizes = {}
+            for i in range(len(this.signals)):
+                this.waves.sizes[this.signals[i]] = this.widths[i]
+
+            this.rows = _ColumnChunks(this.signals, this.widths)
+
+
+        else:
+
+            line = [f.strip() for f in line.split("\t")]
+
+            if len(line) != 1 + len(this.signals):
+                raise ValueError("On line {}, line must contain {} components, but has {}".format(this.trueline, 1 + len(this.signals), len(line)))
+
+            timestamp = line[0]
+
+            try:
+                timestamp = float(timestamp)
+
+            except Exception as e:
+                raise ValueError("On line {}, failed to parse timestamp '{}' due to error: '{}'".format(this.trueline, line[0], e))
+
+            if math.isnan(timestamp):
+                raise ValueError("On line {}, timestamp '{}' is NaN, which is not permitted".format(this.trueline, line[0]))
+
+            if timestamp < 0:
+                raise ValueError("On line {}, timestamp {} is negative, which is not permitted".format(this.trueline, timestamp))
+
+            if this.linum > 4:  # we have at least one previous data point
+                if timestamp <= this.previous:
+                    raise ValueError("On line {}, timestamp {} moves backwards - timestamps must be monotonically increasing".format(this.trueline, timestamp))
+
+            for i in range(len(this.signals)):
+                n = line[i+1]
+                try:
+                     n = int(n)
+                except Exception as e:
+                    raise ValueError("On line {}, failed to parse signal value for signal '{}' due to error: '{}'".format(this.trueline, this.signals[i], e))
+
+                this.rows.columns[i].append(n)
+
+            this.rows.times.append(timestamp)
+            if len(this.rows.times) >= this.rows.chunkRows:
+                this.rows.flush()
+            this.previous = timestamp
+
+        this.linum += 1
+        this.trueline += 1
+
+
+# The sidecar index of a text file, which is written by Waves.buildTextIndex()
+# to the text file's path with ".wvi" appended, lets Waves.loadTextRange() seek
+# to the part of the file it needs. It records a checkpoint every so many
+# sample rows, holding the byte offset and line number of the row, its
+# timestamp, and the value of every signal in it. All integers are
+# little-endian.
+#
+#   offset  size  field
+#   0       8     magic number, the ASCII bytes "WAVESIDX"
+#   8       4     format version (uint32), currently 1
+#   12      4     number of signals N (uint32)
+#   16      8     number of checkpoints K (uint64)
+#   24      8     number of rows between checkpoints (uint64)
+#   32      8     size of the text file in bytes (uint64)
+#   40      8     modification time of the text file in nanoseconds (int64)
+#   48      8     byte offset of the first line after the header (uint64)
+#   56      ...   signal table, as in the binary wave format
+#
+# The signal table is followed by N+3 arrays, each of which starts at the next
+# offset which is a multiple of 64 bytes, with zero padding in between:
+#
+#   * K byte offsets of the checkpoint rows (uint64)
+#   * K line numbers of the checkpoint rows, counting from 1 (uint64)
+#   * K timestamps of the checkpoint rows, as IEEE 754 doubles
+#   * for each signal, in signal table order, K values, stored as in the
+#     binary wave format
+_INDEX_MAGIC = b"WAVESIDX"
+_INDEX_VERSION = 1
+
+# Default number of sample rows between checkpoints of a text index.
+_INDEX_STRIDE = 4096
+
+
+class _TextIndex:
+    """_TextIndex.
+
+    Sidecar index of a text file, see the description of its format above.
+    """
+
+    def __init__(this, sizes: dict, stride: int, size: int, mtime: int, headerBytes: int, offsets, lines, times, states: dict):
+        """__init__.
+
+        :param sizes: dict associating signal names with their widths.
+        :type sizes: dict
+        :param stride: number of rows between checkpoints.
+        :type stride: int
+        :param size: size of the text file in bytes.
+        :type size: int
+        :param mtime: modification time of the text file in nanoseconds.
+        :type mtime: int
+        :param headerBytes: byte offset of the first line after the header.
+        :type headerBytes: int
+        :param offsets: array of the byte offsets of the checkpoint rows.
+        :param lines: array of the line numbers of the checkpoint rows.
+        :param times: array of the timestamps of the checkpoint rows.
+        :param states: dict associating each signal name with an array of its
+            values in the checkpoint rows.
+        :type states: dict
+        """
+
+        this.sizes = sizes
+        this.stride = stride
+        this.size = size
+        this.mtime = mtime
+        this.headerBytes = headerBytes
+        this.offsets = offsets
+        this.lines = lines
+        this.times = times
+        this.states = states
+
+    @staticmethod
+    def pathFor(path) -> str:
+        """pathFor.
+
+        :returns: the path of the sidecar index of a text file.
+        :rtype: str
+        """
+
+        return os.fspath(path) + ".wvi"
+
+    def fresh(this, path) -> bool:
+        """fresh.
+
+        :returns: True if the text file is the same size and has the same
+            modification time as when this index was built.
+        :rtype: bool
+        """
+
+        stat = os.stat(path)
+        return (stat.st_size == this.size) and (stat.st_mtime_ns == this.mtime)
+
+    @classmethod
+    def build(cls, path, stride: int):
+        """build.
+
+        Build the index of a text file, by reading it once.
+
+        :param path: path to the text file.
+        :param stride: number of rows between checkpoints.
+        :type stride: int
+        :returns: the index.
+        :rtype: _TextIndex
+        :raises ValueError: if the file is gzip-compressed, its header is
+            incomplete or invalid, or a checkpoint row cannot be parsed.
+        """
+
+        if stride < 1:
+            raise ValueError("Checkpoints must be at least 1 row apart, got {}".format(stride))
+
+        stat = os.stat(path)
+        header = Waves()
+        parser = _TextParser(header)
+
+        base = 0         # byte offset of the current block
+        lineBase = 0     # number of lines before the current block
+        content = 0      # number of header and sample lines so far
+        headerBytes = None
+        offsets, lines, texts = [], [], []
+
+        with open(path, "rb") as f:
+            if f.peek(2)[:2] == b"\x1f\x8b":
+                raise ValueError("Cannot index gzip-compressed file '{}'".format(os.fspath(path)))
+
+            for block in _streamBlocks(f):
+                data = numpy.frombuffer(block, dtype=numpy.uint8)
+                ends = numpy.flatnonzero(data == ord("\n"))
+                if data[-1] != ord("\n"):
+                    ends = numpy.append(ends, len(data))
+                starts = numpy.concatenate([[0], ends[:-1] + 1])
+
+                # A line is blank if it has no characters other than
+                # whitespace, and a comment if the first of them is "#".
+                # Every other line is a header or sample line.
+                visible = numpy.flatnonzero((data != ord(" ")) & (data != ord("\t")) & (data != ord("\r")) & (data != ord("\n")))
+                first = numpy.minimum(visible.searchsorted(starts), max(len(visible) - 1, 0))
+                if len(visible) > 0:
+                    counted = (visible[first] >= starts) & (visible[first] < ends) & (data[visible[first]] != ord("#"))
+                else:
+                    counted = numpy.zeros(len(starts), dtype=bool)
+                number = content + numpy.cumsum(counted) - 1
+
+                if headerBytes is None:
+                    third = numpy.flatnonzero(counted & (number == 2))
+                    if len(third) > 0:
+                        headerBytes = base + int(ends[third[0]]) + 1
+
+                # sample row r is the (r + 4)th counted line
+                chosen = numpy.flatnonzero(counted & (number >= 3) & ((number - 3) % stride == 0))
+                for i in chosen.tolist():
+                    offsets.append(base + int(starts[i]))
+                    lines.append(lineBase + i + 1)
+                    texts.append(block[starts[i]:ends[i]].decode("utf-8", "surrogatepass"))
+
+                content += int(numpy.count_nonzero(counted))
+                lineBase += len(starts)
+                base += len(block)
+
+            if headerBytes is None:
+                raise ValueError("Text file '{}' has an incomplete header".format(os.fspath(path)))
+
+            f.seek(0)
+            parser.feed(f.read(headerBytes))
+
+        for name, width in header.sizes.items():
+            if width > 64:
+                raise ValueError("Signal '{}' has width {}, but text indices only support widths up to 64 bits".format(name, width))
+
+        signals = list(header.sizes.keys())
+        rows = [cls.parseRow(text, len(signals), linum) for text, linum in zip(texts, lines)]
+        return cls(
+                header.sizes, stride, stat.st_size, stat.st_mtime_ns, headerBytes,
+                numpy.array(offsets, dtype=numpy.uint64),
+                numpy.array(lines, dtype=numpy.uint64),
+                numpy.array([r[0] for r in rows], dtype=numpy.float64),
+                {s: _maskColumn(_toColumn([r[1][i] for r in rows], header.sizes[s]), header.sizes[s]) for i, s in enumerate(signals)})
+
+    @staticmethod
+    def parseRow(text: str, count: int, linum: int):
+        """parseRow.
+
+        :param text: a sample line.
+        :type text: str
+        :param count: number of signals.
+        :type count: int
+        :param linum: line number of the line, for error messages.
+        :type linum: int
+        :returns: the timestamp of the row, and a list of its values.
+        :rtype: tuple[float, list]
+        :raises ValueError: if the line cannot be parsed.
+        """
+
+        fields = [f.strip() for f in text.strip().split("\t")]
+        if len(fields) != 1 + count:
+            raise ValueError("On line {}, line must contain {} components, but has {}".format(linum, 1 + count, len(fields)))
+
+        try:
+            timestamp, values = float(fields[0]), [int(v) for v in fields[1:]]
+        except ValueError as e:
+            raise ValueError("On line {}, failed to parse row due to error: '{}'".format(linum, e))
+
+        if math.isnan(timestamp):
+            raise ValueError("On line {}, timestamp '{}' is NaN, which is not permitted".format(linum, fields[0]))
+
+        return timestamp, values
+
+    def layout(this):
+        """layout.
+
+        :returns: the encoded header (up to the end of the signal table), a list
+            of (offset, dtype) for each array in order, and the total size of
+            the index file.
+        :rtype: tuple[bytes, list, int]
+        """
+
+        header = b"".join([
+                _INDEX_MAGIC,
+                struct.pack("<IIQQQqQ", _INDEX_VERSION, len(this.sizes), len(this.offsets), this.stride, this.size, this.mtime, this.headerBytes),
+                _encodeSignalTable(this.sizes)])
+
+        arrays, total = _arrayLayout(header, [numpy.uint64, numpy.uint64, numpy.float64] + [_dtypeForWidth(this.sizes[name]) for name in this.sizes], len(this.offsets))
+        return header, arrays, total
+
+    def save(this, path):
+        """save.
+
+        Write this index to a file, under a temporary name which is then
+        renamed into place.
+
+        :param path: path to the index file.
+        """
+
+        header, arrays, total = this.layout()
+        _writeLayout(path, header, arrays, [this.offsets, this.lines, this.times] + [this.states[s] for s in this.sizes])
+
+    @classmethod
+    def load(cls, path):
+        """load.
+
+        :param path: path to the index file.
+        :returns: the index.
+        :rtype: _TextIndex
+        :raises ValueError: if the file is not a valid index file.
+        """
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        if (len(data) < 56) or (data[0:8] != _INDEX_MAGIC):
+            raise ValueError("Not a text index file (bad magic number)")
+
+        version, nsignals, count, stride, size, mtime, headerBytes = struct.unpack_from("<IIQQQqQ", data, 8)
+        if version != _INDEX_VERSION:
+            raise ValueError("Unsupported text index file version {}".format(version))
+
+        sizes, offset = _decodeSignalTable(data, 56, nsignals)
+
+        index = cls(sizes, stride, size, mtime, headerBytes, None, None, None, {})
+        index.offsets = numpy.zeros(count, dtype=numpy.uint64)
+        header, arrays, total = index.layout()
+        if len(data) < total:
+            raise ValueError("Text index file is truncated, expected {} bytes but got {}".format(total, len(data)))
+
+        views = [numpy.frombuffer(data, dtype=dtype, count=count, offset=offset) for offset, dtype in arrays]
+        index.offsets, index.lines, index.times = views[0], views[1], views[2]
+        index.states = {name: views[i+3] for i, name in enumerate(sizes)}
+        return index
+
+    @classmethod
+    def forFile(cls, path, stride: int):
+        """forFile.
+
+        :param path: path to a text file.
+        :param stride: number of rows between checkpoints, if the index needs
+            to be built.
+        :type stride: int
+        :returns: the sidecar index of the text file, which is built and saved
+            if there is none, or it is out of date. Failing to save it is not
+            an error.
+        :rtype: _TextIndex
+        """
+
+        indexPath = cls.pathFor(path)
+        try:
+            index = cls.load(indexPath)
+            if index.fresh(path):
+                return index
+        except (OSError, ValueError):
+            pass
+
+        return cls.rebuild(path, stride)
+
+    @classmethod
+    def rebuild(cls, path, stride: int):
+        """rebuild.
+
+        Build the sidecar index of a text file and save it, as for forFile().
+
+        :rtype: _TextIndex
+        """
+
+        index = cls.build(path, stride)
+        try:
+            index.save(cls.pathFor(path))
+        except OSError:
+            pass
+        return index
+
+
+class _VCDReader:
+    """_VCDReader.
+
+    Incremental reader for VCD files, which tokenizes the declarations and
+    value changes of a dump as it is read and feeds the resulting rows
+    straight into the storage of a Waves object.
+
+    Scopes are flattened by joining the names of the enclosing scopes and the
+    variable with '.', leaving out any scope named 'root'. Only variables of
+    type 'wire' are kept.
+
+    A signal's value at row time T is that of its last change strictly before
+    T, except that its first change (normally its initial value from
+    $dumpvars) applies from time 0 until its next change. Rows are emitted
+    at T=0 and one tick after each time at which some value changed, but only
+    if the row differs from the previous one. If the last time in the dump is
+    after the last row, a final row is emitted at it, so that the capture
+    keeps its end time.
+    """
+
+    # keywords whose contents up to $end are ignored
+    SKIPPED = {"$comment", "$date", "$version", "$timescale"}
+
+    # keywords which wrap value changes in the body of the dump, and so can
+    # be ignored along with their closing $end
+    SIMULATION = {"$dumpall", "$dumpoff", "$dumpon", "$dumpvars", "$end"}
+
+    def __init__(this, waves, timescale: float):
+        this.waves = waves
+
+        # Rows are stored with ticks of 10**-digits, so that a VCD time t is
+        # t * multiplier ticks, unless the timescale or the times are not
+        # representable that way, in which case they have float ticks.
+        this.timescale = timescale
+        this.digits = _digitsOfTimes([timescale])
+        this.multiplier = None
+        if this.digits != _FLOAT_TICKS:
+            this.multiplier = int(round(timescale * _TICK_SCALES[this.digits]))
+
+        # names of the enclosing scopes, innermost last
+        this.scopes = []
+
+        # signal names in declaration order, and their widths
+        this.signals = []
+        this.widths = []
+
+        # associates VCD identifier codes with the indices into this.signals
+        # of the signals they drive
+        this.ids = {}
+
+        # per-signal state: whether a value has been seen yet, the first
+        # value seen, and the current value
+        this.seen = []
+        this.firsts = []
+        this.current = []
+
+        # the time of the block of value changes being read, whether any
+        # value changed (other than a signal's first value) in this block,
+        # and the values of the last row emitted
+        this.now = 0
+        this.dirty = False
+        this.last = None
+        this.lastTick = None
+        this.rows = None
+
+    def read(this, tokens):
+        """read.
+
+        Read an entire VCD file.
+
+        :param tokens: iterator over the whitespace separated tokens of the
+            file.
+        :raises ValueError: if the file is malformed.
+        """
+
+        tokens = iter(tokens)
+        for token in tokens:
+            if token == "$enddefinitions":
+                this.skip(tokens)
+                break
+            this.declaration(token, tokens)
+        else:
+            raise ValueError("VCD file has no $enddefinitions")
+
+        this.rows = _ColumnChunks(this.signals, this.widths, numpy.int64)
+        this.seen = [False for s in this.signals]
+        this.firsts = [0 for s in this.signals]
+        this.current = [0 for s in this.signals]
+
+        for token in tokens:
+            c = token[0]
+            if c == "#":
+                time = int(token[1:])
+                if time < this.now:
+                    raise ValueError("VCD time moves backwards from {} to {}".format(this.now, time))
+                if time > this.now:
+                    # repeated timestamps continue the current block
+                    this.emit()
+                    this.now = time
+
+            elif c == "$":
+                if token == "$comment":
+                    this.skip(tokens)
+                elif token not in this.SIMULATION:
+                    raise ValueError("Unexpected VCD keyword '{}'".format(token))
+
+            elif c in "bBrR":
+                this.change(this.identifier(tokens, token), token)
+
+            elif c == "s":
+                this.change(this.identifier(tokens, token), token[1:])
+
+            else:
+                this.change(token[1:], token[0])
+
+        this.emit()
+        if (this.last is not None) and (this.lastTick < this.now):
+            this.append(this.now, this.last)
+
+    def identifier(this, tokens, value: str) -> str:
+        """identifier.
+
+        :param tokens: iterator over the tokens following a vector, real or
+            string value change.
+        :param value: the value of the change, for error messages.
+        :type value: str
+        :returns: the identifier code of the variable which changed.
+        :rtype: str
+        :raises ValueError: if the file ends before the identifier code.
+        """
+
+        for token in tokens:
+            return token
+
+        raise ValueError("Unexpected end of VCD file after value '{}' at time #{}".format(value, this.now))
+
+    def skip(this, tokens):
+        """skip.
+
+        Consume tokens up to and including the next $end.
+
+        :returns: the tokens consumed, not including $end.
+        :rtype: list[str]
+        """
+
+        words = []
+        for token in tokens:
+            if token == "$end":
+                return words
+            words.append(token)
+
+        raise ValueError("VCD file ends inside a declaration")
+
+    def declaration(this, keyword: str, tokens):
+        """declaration.
+
+        Handle one declaration from the header of a VCD file.
+
+        :param keyword: the keyword starting the declaration.
+        :type keyword: str
+        :param tokens: iterator over the following tokens.
+        """
+
+        if keyword == "$scope":
+            words = this.skip(tokens)
+            if len(words) != 2:
+                raise ValueError("Malformed VCD $scope declaration: '{}'".format(" ".join(words)))
+            this.scopes.append(words[1])
+
+        elif keyword == "$upscope":
+            this.skip(tokens)
+            if len(this.scopes) == 0:
+                raise ValueError("VCD $upscope without matching $scope")
+            this.scopes.pop()
+
+        elif keyword == "$var":
+            words = this.skip(tokens)
+            if len(words) < 4:
+                raise ValueError("Malformed VCD $var declaration: '{}'".format(" ".join(words)))
+
+            # any bit range following the reference is ignored
+            sigType, width, vcdId, reference = words[:4]
+            if sigType != "wire":
+                return
+
+            name = "".join([s + "." for s in this.scopes if s != "root"]) + reference
+            if name in this.signals:
+                raise ValueError("Duplicate VCD signal '{}'".format(name))
+
+            this.ids.setdefault(vcdId, []).append(len(this.signals))
+            this.signals.append(name)
+            this.widths.append(int(width))
+
+        elif keyword in this.SKIPPED:
+            this.skip(tokens)
+
+        else:
+            raise ValueError("Unexpected VCD keyword '{}'".format(keyword))
+
+    def change(this, vcdId: str, value: str):
+        """change.
+
+        Apply one value change at the current time.
+
+        :param vcdId: identifier code of the variable which changed.
+        :type vcdId: str
+        :param value: the new value, as it appears in the VCD file.
+        :type value: str
+        """
+
+        if vcdId not in this.ids:
+            # either not a wire, or not declared at all
+            return
+
+        value = _vcdValue(value)
+        for i in this.ids[vcdId]:
+            masked = value & _widthMask(this.widths[i])
+            this.current[i] = masked
+
+            if this.seen[i]:
+                this.dirty = True
+                continue
+
+            this.seen[i] = True
+            this.firsts[i] = masked
+            if this.last is not None:
+                # the first value of a signal applies from time 0, so
+                # fill it in to the rows which have already been emitted
+                this.rows.fill(i, masked)
+                this.last[i] = masked
+
+    def emit(this):
+        """emit.
+
+        Emit the rows due at the end of the current block of value changes.
+        """
+
+        if this.last is None:
+            if not any(this.seen):
+                return
+
+            # the first row holds every signal's first value, which the
+            # current values have not moved away from unless this block
+            # already changed them
+            this.last = [this.firsts[i] if this.seen[i] else 0 for i in range(len(this.signals))]
+            this.append(0, this.last)
+
+        if not this.dirty:
+            return
+        this.dirty = False
+
+        if this.current != this.last:
+            this.last = list(this.current)
+            this.append(this.now + 1, this.last)
+
+    def append(this, tick: int, values: list):
+        """append.
+
+        :param tick: VCD time of the row.
+        :type tick: int
+        :param values: value of each signal.
+        :type values: list
+        """
+
+        this.lastTick = tick
+        this.rows.times.append(tick)
+        for i in range(len(values)):
+            this.rows.columns[i].append(values[i])
+
+        if len(this.rows.times) >= this.rows.chunkRows:
+            this.rows.flush()
+
+    def finish(this):
+        """finish.
+
+        Store the rows read into the Waves object being read into.
+        """
+
+        this.waves.sizes = {}
+        for i in range(len(this.signals)):
+            this.waves.sizes[this.signals[i]] = this.widths[i]
+
+        times, columns = this.rows.finish()
+
+        digits = this.digits
+        if (len(times) > 0) and (digits != _FLOAT_TICKS) and (int(times[-1]) * this.multiplier >= _TICK_LIMIT):
+            digits = _FLOAT_TICKS
+
+        if digits == _FLOAT_TICKS:
+            ticks = _ticksFromTimes(times * this.timescale, digits)
+        else:
+            ticks = times * this.multiplier
+
+        this.waves._setStorage(ticks, digits, columns)
+        this.waves._compact()
+
+
+# writeText() and writeVCD() format and write this many rows at a time.
+_WRITE_ROWS = 1 << 14
+
+
+class _EncodedWriter:
+    """_EncodedWriter.
+
+    Adapts a binary file object to accept text, which is encoded as UTF-8.
+    """
+
+    def __init__(this, fileobj):
+        this.fileobj = fileobj
+
+    def write(this, text: str):
+        this.fileobj.write(text.encode("utf-8"))
+
+
+def _textOutput(fileobj):
+    """_textOutput.
+
+    :param fileobj: a file object opened in either text or binary mode.
+    :returns: an object with a write() method accepting text, which writes to
+        fileobj.
+    """
+
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+
+    return _EncodedWriter(fileobj)
+
+
+def _changedRows(column, start: int, end: int):
+    """_changedRows.
+
+    :param column: a column array.
+    :param start: index of the first row to consider, at least 1.
+    :type start: int
+    :param end: index one past the last row to consider.
+    :type end: int
+    :returns: the indices in [start, end) of the rows whose value differs
+        from that of the previous row.
+    :rtype: numpy.ndarray
+    """
+
+    if isinstance(column, _SparseColumn):
+        return column.changedRows(start, end)
+
+    return numpy.flatnonzero(column[start:end] != column[start - 1:end - 1]) + start
+
+# Decimal representations of every value of the narrow column dtypes, so that
+# those columns can be formatted by indexing rather than one value at a time.
+_DIGITS = {
+    numpy.dtype(numpy.uint8): numpy.array([str(v) for v in range(1 << 8)], dtype=object),
+    numpy.dtype(numpy.uint16): numpy.array([str(v) for v in range(1 << 16)], dtype=object),
+}
+
+
+def _formatColumn(column) -> list:
+    """_formatColumn.
+
+    :param column: a column array, or a slice of one.
+    :returns: the decimal representation of each value in the column.
+    :rtype: list[str]
+    """
+
+    if column.dtype in _DIGITS:
+        return _DIGITS[column.dtype][column].tolist()
+
+    return [str(v) for v in column.tolist()]
+
+
+class _Rows:
+    """_Rows.
+
+    Sequence presenting the columnar storage of a Waves object as the
+    (timestamp, signals) tuples that older versions of this library stored in
+    Waves.data. Each row is materialized on access, so this view costs
+    nothing until it is used.
+
+    Rows can be added to the end with append() and extend(), which call the
+    methods of the same name of the Waves object. Rows cannot be replaced,
+    inserted or removed in place.
+    """
+
+    def __init__(this, waves):
+        this.waves = waves
+
+    def append(this, row):
+        """append.
+
+        :param row: (timestamp, signals) tuple, see Waves.append().
+        :raises ValueError: if the timestamp is not after that of the last row.
+        """
+
+        this.waves.append(row[0], row[1])
+
+    def extend(this, rows):
+        """extend.
+
+        :param rows: iterable of (timestamp, signals) tuples, see
+            Waves.extend().
+        :raises ValueError: if the timestamps are not strictly increasing, or
+            the first is not after that of the last row already stored.
+        """
+
+        this.waves.extend(rows)
+
+    def __setitem__(this, index, row):
+        raise TypeError("Rows of Waves.data cannot be replaced in place; use Waves.append() or Waves.extend() to add rows, or assign a new list to Waves.data")
+
+    def __delitem__(this, index):
+        raise TypeError("Rows of Waves.data cannot be removed in place; assign a new list to Waves.data instead")
+
+    def insert(this, index, row):
+        raise TypeError("Rows cannot be inserted into Waves.data; use Waves.append() or Waves.extend() to add rows at the end, or assign a new list to Waves.data")
+
+    def __len__(this):
+        return this.waves.samples()
+
+    def __getitem__(this, index):
+        if isinstance(index, slice):
+            return [this[i] for i in range(*index.indices(len(this)))]
+
+        if index < 0:
+            index += len(this)
+        if (index < 0) or (index >= len(this)):
+            raise IndexError("sample index out of range")
+
+        return this.waves.row(index)
+
+    def __iter__(this):
+        signals = list(this.waves.signals())
+        columns = [this.waves.column(s).tolist() for s in signals]
+        for index, t in enumerate(this.waves.timeColumn().tolist()):
+            yield t, {signals[i]: columns[i][index] for i in range(len(signals))}
+
+
+# Default size limit of a ParseCache, in bytes.
+_CACHE_BYTES = 1 << 30
+
+# Temporary files in a ParseCache directory which are older than this many
+# seconds were left behind by writers which died, and are removed.
+_CACHE_STALE = 3600
+
+# Prepended to the input when hashing it for a ParseCache, so that keys from
+# other versions of the text format or its parser never collide.
+_CACHE_SALT = b"waves text v2\n"
+
+
+def _hashStream(fileobj):
+    """_hashStream.
+
+    Hash the contents of a file object for a ParseCache, without losing them.
+
+    :param fileobj: a file object opened in text or binary mode.
+    :returns: the hash, and a file object to parse the contents from. This is
+        fileobj itself, rewound to where it was, if it is seekable, or a new
+        file object holding the contents which were read from it otherwise.
+    :rtype: tuple[str, object]
+    """
+
+    text = isinstance(fileobj, io.TextIOBase)
+    digest = hashlib.sha256(_CACHE_SALT)
+
+    if hasattr(fileobj, "seekable") and fileobj.seekable():
+        position = fileobj.tell()
+        while True:
+            chunk = fileobj.read(_BLOCK_BYTES)
+            if len(chunk) == 0:
+                break
+            digest.update(chunk.encode("utf-8", "surrogatepass") if text else chunk)
+        fileobj.seek(position)
+        return digest.hexdigest(), fileobj
+
+    data = fileobj.read()
+    if text:
+        data = data.encode("utf-8", "surrogatepass")
+    digest.update(data)
+    return digest.hexdigest(), io.BytesIO(data)
+
+
+class ParseCache:
+    """ParseCache.
+
+    On-disk cache of parsed text files, so that loading the same input again
+    skips parsing it. Entries are keyed by a hash of the input's bytes, and
+    each is stored as a binary wave file (see saveBinary()), which is
+    memory-mapped on a hit.
+
+    The total size of the entries is kept under a limit by removing the least
+    recently used ones whenever an entry is added. Any number of processes may
+    share a cache directory: entries are written under temporary names and
+    renamed into place, so a reader only ever sees complete entries, and
+    entries removed while they are mapped stay valid for their readers.
+
+    Waves.parseCache holds the cache used by the text loaders, if any. It is
+    set from the WAVES_PARSE_CACHE environment variable, which names the cache
+    directory, and WAVES_PARSE_CACHE_BYTES, which sets the size limit.
+    """
+
+    def __init__(this, directory, maxBytes: int=_CACHE_BYTES):
+        """__init__.
+
+        :param directory: Path to the cache directory, which is created if it
+            does not exist.
+        :param maxBytes: The most bytes which the entries may take up.
+        :type maxBytes: int
+        """
+
+        this.directory = os.fspath(directory)
+        this.maxBytes = maxBytes
+        os.makedirs(this.directory, exist_ok=True)
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        """key.
+
+        :param data: the bytes of an input.
+        :type data: bytes
+        :returns: the key of the input's entry.
+        :rtype: str
+        """
+
+        digest = hashlib.sha256(_CACHE_SALT)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def path(this, key: str) -> str:
+        """path.
+
+        :returns: the path of the entry for the given key.
+        :rtype: str
+        """
+
+        return os.path.join(this.directory, key + ".wvb")
+
+    def load(this, key: str, waves) -> bool:
+        """load.
+
+        Load the entry for a key into a Waves object, if there is one. Entries
+        which cannot be read are removed.
+
+        :param key: the key of the entry.
+        :type key: str
+        :param waves: the object to load into.
+        :type waves: Waves
+        :returns: True if the entry was loaded, False if there was none.
+        :rtype: bool
+        """
+
+        path = this.path(key)
+        try:
+            waves.loadBinary(path)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            this._remove(path)
+            return False
+
+        # the modification time orders entries for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True
+
+    def store(this, key: str, waves):
+        """store.
+
+        Add an entry for a key holding the contents of a Waves object, then
+        evict entries to keep under the size limit. Failing to write the entry,
+        for example because the disk is full, is not an error.
+
+        Inputs with values which do not fit in their signal's width are not
+        stored, since the binary wave format masks them.
+
+        :param key: the key of the entry.
+        :type key: str
+        :param waves: the parsed input.
+        :type waves: Waves
+        """
+
+        for s in waves.sizes:
+            if waves._columns[s].dtype != _dtypeForWidth(waves.sizes[s]):
+                return
+
+        try:
+            waves.saveBinary(this.path(key))
+        except (OSError, ValueError):
+            return
+
+        this.evict()
+
+    def evict(this):
+        """evict.
+
+        Remove the least recently used entries until the rest fit in the size
+        limit, along with any stale temporary files.
+        """
+
+        entries = []
+        now = time.time()
+        try:
+            with os.scandir(this.directory) as it:
+                for entry in it:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if entry.name.endswith(".wvb"):
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    elif entry.name.endswith(".tmp") and (now - stat.st_mtime > _CACHE_STALE):
+                        this._remove(entry.path)
+        except OSError:
+            return
+
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= this.maxBytes:
+                break
+            this._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        """_remove.
+
+        Remove a file from the cache directory. Another process may have
+        removed it already, or on Windows have it mapped, in which case it is
+        left for a later eviction.
+        """
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _parseCacheFromEnvironment():
+    """_parseCacheFromEnvironment.
+
+    :returns: the ParseCache configured by the WAVES_PARSE_CACHE and
+        WAVES_PARSE_CACHE_BYTES environment variables, or None if there is
+        none, or if they are not usable. This is called on import, so a bad
+        setting leaves the cache off rather than raising.
+    :rtype: ParseCache
+    """
+
+    directory = os.environ.get("WAVES_PARSE_CACHE", "")
+    if directory == "":
+        return None
+
+    maxBytes = _CACHE_BYTES
+    if os.environ.get("WAVES_PARSE_CACHE_BYTES", "") != "":
+        try:
+            maxBytes = int(os.environ["WAVES_PARSE_CACHE_BYTES"])
+        except ValueError:
+            return None
+
+    try:
+        return ParseCache(directory, maxBytes)
+    except OSError:
+        return None
+
+
+class SharedWaves:
+    """SharedWaves.
+
+    Handle to a copy of a Waves object's sample data in a shared memory
+    block, as returned by Waves.toSharedMemory(). Other processes attach to it
+    by name with Waves.attachShared().
+
+    The block is owned by this handle, and is destroyed when close() is
+    called, when the handle is garbage collected, or when the process exits,
+    whichever comes first. Processes which have already attached keep their
+    copy of it until they are done with it; only new attachments fail.
+
+    A SharedWaves can be used as a context manager, which closes it on exit.
+    """
+
+    def __init__(this, block):
+        """__init__.
+
+        :param block: the shared memory block, which this handle takes
+            ownership of.
+        :type block: multiprocessing.shared_memory.SharedMemory
+        """
+
+        this.name = block.name
+        this.size = block.size
+        this._finalizer = weakref.finalize(this, _releaseShared, block)
+
+    def close(this):
+        """close.
+
+        Destroy the shared memory block. This is safe to call more than once.
+        """
+
+        this._finalizer()
+
+    @property
+    def closed(this) -> bool:
+        return not this._finalizer.alive
+
+    def __enter__(this):
+        return this
+
+    def __exit__(this, *exc):
+        this.close()
+
+    def __reduce__(this):
+        raise TypeError("SharedWaves handles cannot be pickled, pass the name of the block to other processes instead")
+
+
+class Waves:
+    """Waves.
+
+    This object represents a collection of zero or more waves, which are
+    assumed to be digital signals of not more than 64 bits each in width, which
+    are sampled at various points in time.
+    """
+
+    # ParseCache used by loadText(), loadTextStream() and fromFile(), or None
+    # to always parse. See ParseCache for how to enable it.
+    parseCache = _parseCacheFromEnvironment()
+
+
+    def __init__(this):
+        """__init__.
+
+        Instantiates a new collection of waves, containing no sample data. Once
+        instantiated, use the .loadText() or .loadVCD() methods to populate
+        this object with sample data.
+
+        :param this:
+        """
+
+        # Array of sample timestamps, one per row, as int64 ticks. The time of
+        # a tick is tick / 10**this._digits (see _timesFromTicks()). This
+        # array must be kept sorted in strictly increasing order.
+        this._ticks = numpy.zeros(0, dtype=numpy.int64)
+        this._digits = 0
+
+        # Hash table associating signal names with an array of that signal's
+        # values, one per row. Each array uses the narrowest dtype which fits
+        # the signal's width (see _dtypeForWidth()), unless it holds values
+        # outside of that width, which are stored unmasked (see _toColumn()).
+        # Signals which rarely change may be stored as a _SparseColumn
+        # instead, which can be indexed the same way.
+        this._columns = {}
+
+        # Hash table associating signal names with their widths in bits. All
+        # signals in the waveform must have a key in this table.
+        this.sizes = {}
+
+        # Hash table associating signal names with their edge indices, built
+        # lazily by _edgeIndex(). This must be cleared whenever the sample
+        # data is replaced, and is kept up to date by _extendStorage().
+        this._edges = {}
+
+        # Hash table associating the arrays which _extendStorage() appends to
+        # with _Growable objects holding them. It is keyed by a tuple of the
+        # array's role and signal name, such as ("rising", "clk"), and is
+        # cleared whenever the sample data is replaced.
+        this._growth = {}
+
+    @property
+    def data(this):
+        """data.
+
+        Sample data as a sequence of (timestamp, signals) tuples, where
+        signals is a dict associating signal names with their values. This
+        is kept for compatibility with code written against older versions of
+        this library, which stored samples this way; new code should prefer
+        timeColumn() and column(), which return the underlying arrays without
+        building a dict per row.
+
+        Assigning a list of such tuples, or any other iterable of them, to
+        this property replaces the stored sample data. The signal widths in
+        this.sizes must already be set.
+
+        Unlike the list older versions stored, the sequence returned is a view
+        which only supports adding rows at the end: data.append() and
+        data.extend() call append() and extend(), and so require increasing
+        timestamps. Replacing, inserting or removing rows in place, as in
+        data[i] = row, raises TypeError; assign a new list instead.
+        """
+
+        return _Rows(this)
+
+    @data.setter
+    def data(this, rows):
+        rows = list(rows)
+        signals = list(this.sizes.keys())
+        this._assign(
+                [r[0] for r in rows],
+                {s: [r[1][s] for r in rows] for s in signals})
+
+    def _assign(this, timestamps, columns: dict):
+        """_assign.
+
+        Replace the stored sample data with the given timestamps and signal
+        values. Values are stored as given, see _toColumn().
+
+        :param timestamps: sequence of float timestamps, one per row.
+        :param columns: dict associating each signal name in this.sizes with
+            a sequence of values, one per row.
+        :type columns: dict
+        """
+
+        timestamps = numpy.asarray(timestamps, dtype=numpy.float64)
+        digits = _digitsOfTimes(timestamps)
+        this._setStorage(
+                _ticksFromTimes(timestamps, digits), digits,
+                {s: _toColumn(columns[s], this.sizes[s]) for s in this.sizes})
+
+    def _setStorage(this, ticks, digits: int, columns: dict):
+        """_setStorage.
+
+        Replace the stored sample data with the given arrays, which must
+        already be of the dtypes this object stores (see _assign()). Cached
+        indices are discarded.
+
+        :param ticks: int64 array of timestamps as ticks, one per row.
+        :type ticks: numpy.ndarray
+        :param digits: number of decimal places per tick.
+        :type digits: int
+        :param columns: dict associating each signal name in this.sizes with
+            its column array.
+        :type columns: dict
+        """
+
+        for s in this.sizes:
+            if len(columns[s]) != len(ticks):
+                raise ValueError("Signal '{}' has {} values, but there are {} timestamps".format(s, len(columns[s]), len(ticks)))
+
+        this._ticks = ticks
+        this._digits = digits
+        this._columns = {s: columns[s] for s in this.sizes}
+        this._edges = {}
+        this._growth = {}
+
+    def _grow(this, key: tuple, array, values):
+        """_grow.
+
+        Append values to one of the arrays making up this object's storage,
+        using the spare capacity of the _Growable which holds it if there is
+        one, or else copying it into a new one.
+
+        :param key: role and signal name of the array, see this._growth.
+        :type key: tuple
+        :param array: the array as currently stored.
+        :param values: array of values to append.
+        :returns: the array with values appended.
+        :rtype: numpy.ndarray
+        """
+
+        # values which do not fit the array's dtype, such as out of range
+        # signal values (see _toColumn()), promote the whole array
+        dtype = _columnDtype([array.dtype, values.dtype])
+
+        growable = this._growth.get(key)
+        if (growable is None) or (growable.view is not array) or (growable.buffer.dtype != dtype):
+            growable = _Growable(array.astype(dtype, copy=False))
+            this._growth[key] = growable
+
+        return growable.extend(values)
+
+    def _extendStorage(this, timestamps, columns: dict):
+        """_extendStorage.
+
+        Append rows to the stored sample data, updating any cached edge
+        indices and change lists rather than rebuilding them.
+
+        The ticks already stored are rescaled if the new timestamps need more
+        decimal places than they have.
+
+        :param timestamps: float64 array of timestamps of the new rows.
+        :type timestamps: numpy.ndarray
+        :param columns: dict associating each signal name in this.sizes with
+            a column array of its values in the new rows.
+        :type columns: dict
+        :raises ValueError: if the timestamps are not strictly increasing, or
+            do not follow those already stored.
+        """
+
+        if len(timestamps) == 0:
+            return
+
+        if (len(timestamps) > 1) and not (timestamps[1:] > timestamps[:-1]).all():
+            raise ValueError("Timestamps must be strictly increasing")
+
+        # the ticks already stored must still fit with the new number of
+        # decimal places, and the first and last of them are the largest
+        length = this.samples()
+        times = timestamps
+        if length > 0:
+            times = numpy.concatenate([this._times([0, -1]), timestamps])
+        digits = _digitsOfTimes(times, this._digits)
+        ticks = _ticksFromTimes(timestamps, digits)
+        if length > 0:
+            if not (ticks[0] > _rescaleTicks(this._ticks[-1:], this._digits, digits)[0]):
+                raise ValueError("Timestamp {} is not after the previous timestamp {}".format(timestamps[0], this.row(length - 1)[0]))
+
+        if digits != this._digits:
+            this._ticks = _rescaleTicks(this._ticks, this._digits, digits)
+            this._digits = digits
+
+        for s in this.sizes:
+            if len(columns[s]) != len(timestamps):
+                raise ValueError("Signal '{}' has {} values, but there are {} timestamps".format(s, len(columns[s]), len(timestamps)))
+
+        for s in this.sizes:
+            new = columns[s]
+            column = this._columns.get(s)
+            if column is None:
+                if length > 0:
+                    raise ValueError("Signal '{}' has no values, use addSignal() to add signals to a non-empty Waves".format(s))
+                column = numpy.zeros(0, dtype=new.dtype)
+
+            # Rows at which the value differs from the row before, counting
+            # the last row already stored as the row before the first new one.
+            if length > 0:
+                values = _concatArrays([column[-1:], new], new.dtype)
+                changed = numpy.flatnonzero(values[1:] != values[:-1])
+                before, after = values[changed], values[changed + 1]
+                changed += length
+            else:
+                changed = numpy.flatnonzero(new[1:] != new[:-1]) + 1
+                before, after = new[changed - 1], new[changed]
+
+            if s in this._edges:
+                rising, falling = this._edges[s]
+                this._edges[s] = (
+                        this._grow(("rising", s), rising, changed[before < after]),
+                        this._grow(("falling", s), falling, changed[before > after]))
+
+            if isinstance(column, _SparseColumn):
+                this._columns[s] = _SparseColumn(
+                        this._grow(("changes", s), column.changes, changed.astype(numpy.int64)),
+                        this._grow(("values", s), column.values, after),
+                        length + len(new))
+            else:
+                this._columns[s] = this._grow(("column", s), column, new)
+
+        this._ticks = this._grow(("time", None), this._ticks, ticks)
+
+    def _compact(this):
+        """_compact.
+
+        Compact freshly loaded sample data: rows at which no signal changed
+        are dropped, apart from the last row, which keeps the end time of the
+        capture, and signals which rarely change are stored as change lists
+        (see _SparseColumn) rather than densely.
+        """
+
+        if this.samples() < 2:
+            return
+
+        keep = numpy.zeros(this.samples(), dtype=bool)
+        keep[0] = True
+        keep[-1] = True
+        for s in this.sizes:
+            values = this._columns[s]
+            keep[1:] |= values[1:] != values[:-1]
+
+        ticks = this._ticks
+        columns = this._columns
+        if not keep.all():
+            ticks = ticks[keep]
+            columns = {s: columns[s][keep] for s in this.sizes}
+
+        this._setStorage(ticks, this._digits, {s: _SparseColumn.encode(columns[s]) for s in this.sizes})
+
+    @property
+    def timescale(this) -> float:
+        """timescale.
+
+        The time of one tick, see tickColumn(). This is a power of ten, taken
+        from the decimal precision of the timestamps of text files, or from
+        the timescale a VCD file was loaded with. It is None if the timestamps
+        cannot all be represented exactly as multiples of a power of ten with
+        fewer than 2**53 ticks, for example if they were printed with full
+        float precision.
+        """
+
+        if this._digits == _FLOAT_TICKS:
+            return None
+        return 1.0 / _TICK_SCALES[this._digits]
+
+    def timeColumn(this):
+        """timeColumn.
+
+        :returns: a read-only array of sample timestamps as floats, with one
+            entry per row. This is a new array converted from tickColumn().
+        :rtype: numpy.ndarray
+        """
+
+        return _readOnly(this._times(0, this.samples()))
+
+    def tickColumn(this):
+        """tickColumn.
+
+        :returns: a read-only view of the array of sample timestamps as int64
+            ticks, with one entry per row. The time of each tick is the tick
+            multiplied by this.timescale. If that is None, the ticks are the
+            bits of the float64 timestamps instead, negated for negative
+            times, which sort in the same order as the timestamps.
+        :rtype: numpy.ndarray
+        """
+
+        return _readOnly(this._ticks)
+
+    def _times(this, start, end=None):
+        """_times.
+
+        :param start: index of the first row, or an array of row indices.
+        :param end: index one past the last row, if start is an index.
+        :returns: a new array of the float timestamps of the given rows.
+        :rtype: numpy.ndarray
+        """
+
+        if end is None:
+            return _timesFromTicks(this._ticks[start], this._digits)
+        return _timesFromTicks(this._ticks[start:end], this._digits)
+
+    def _rowsAtOrBefore(this, time: float) -> int:
+        """_rowsAtOrBefore.
+
+        :param time: a float time.
+        :type time: float
+        :returns: the number of rows with timestamps less than or equal to
+            time.
+        :rtype: int
+        """
+
+        return int(this._ticks.searchsorted(_tickAtOrBefore(time, this._digits), side="right"))
+
+    def _rowsBefore(this, time: float) -> int:
+        """_rowsBefore.
+
+        :param time: a float time.
+        :type time: float
+        :returns: the number of rows with timestamps strictly less than time.
+        :rtype: int
+        """
+
+        # several ticks may have the same time, so rather than stepping back
+        # one tick, step back to the float just before time
+        return this._rowsAtOrBefore(float(numpy.nextafter(time, -numpy.inf)))
+
+    def column(this, signal: str):
+        """column.
+
+        :param signal: The name of the signal.
+        :type signal: str
+        :returns: a read-only view of the array of values for the given
+            signal, with one entry per row. The dtype is the narrowest
+            unsigned integer type that fits the signal's width, unless some
+            value was out of range for it, in which case the values are not
+            masked, as described for signalAt(). For signals
+            stored as change lists, this is a new array expanded from the
+            change list.
+        :rtype: numpy.ndarray
+        :raises KeyError: if signal is not a know signal name for this object.
+        """
+
+        if signal not in this.sizes.keys():
+            raise KeyError("Unknown signal '{}'".format(signal))
+
+        return _readOnly(this._columns[signal][:])
+
+    def row(this, index: int):
+        """row.
+
+        :param index: The sample index to retrieve.
+        :type index: int
+        :returns: the timestamp of the given sample, and a dict associating
+            each signal name with its value at that sample.
+        :rtype: tuple[float, dict]
+        """
+
+        return float(this._times(index)), {s: int(this._columns[s][index]) for s in this.sizes}
+
+    def window(this, t0: float, t1: float):
+        """window.
+
+        Create a read-only view of the samples between two points in time,
+        which shares its sample storage with this object. The view is itself
+        a Waves object, so all of the usual query methods work on it.
+
+        The first row of the view is the row of this object which is current
+        at t0, so that the view carries in the value of every signal at t0;
+        its timestamp may be earlier than t0. The remaining rows are those of
+        this object with timestamps in the half-open interval (t0, t1).
+
+        The sample arrays of the view are read-only. Loading new data into the
+        view replaces its storage without affecting this object.
+
+        :param t0: The start of the window.
+        :type t0: float
+        :param t1: The end of the window, which is not included in it.
+        :type t1: float
+        :returns: a view of the samples in the window.
+        :rtype: Waves
+        :raises ValueError: if t0 is negative, or t1 is less than t0.
+        """
+
+        if t0 < 0:
+            raise ValueError("Time cannot be negative, got {}.".format(t0))
+
+        if t1 < t0:
+            raise ValueError("Window end {} is before its start {}.".format(t1, t0))
+
+        view = Waves()
+        view.sizes = dict(this.sizes)
+
+        start = this.indexOfTime(t0)
+        end = max(this._rowsBefore(t1), start + 1)
+        end = min(end, this.samples())
+
+        view._setStorage(
+                _readOnly(this._ticks[start:end]), this._digits,
+                {s: _windowColumn(this._columns[s], start, end) for s in this.sizes})
+
+        # Edge indices which have already been built can be narrowed to the
+        # window rather than rebuilt from its samples.
+        for s, (rising, falling) in this._edges.items():
+            view._edges[s] = tuple([
+                edges[edges.searchsorted(start, side="right"):edges.searchsorted(end, side="left")] - start
+                for edges in (rising, falling)])
+
+        return view
+
+    def addSignal(this, signal: str, width: int):
+        """addSignal.
+
+        Add a new signal to this object, whose value is 0 in every row
+        already stored.
+
+        :param signal: The name of the signal.
+        :type signal: str
+        :param width: The width of the signal in bits.
+        :type width: int
+        :raises ValueError: if the signal already exists.
+        """
+
+        if signal in this.sizes:
+            raise ValueError("Signal '{}' already exists".format(signal))
+
+        this.sizes[signal] = width
+        this._columns[signal] = _SparseColumn.encode(numpy.zeros(this.samples(), dtype=_dtypeForWidth(width)))
+
+    def append(this, timestamp: float, values: dict):
+        """append.
+
+        Append one row to the end of the stored sample data. This takes
+        amortized constant time, and keeps any cached indices up to date.
+
+        :param timestamp: The timestamp of the new row, which must be after
+            that of the last row.
+        :type timestamp: float
+        :param values: dict associating signal names with their values in the
+            new row. Signals which are left out keep their value from the
+            previous row, or are 0 if there is none.
+        :type values: dict
+        :raises ValueError: if the timestamp is not after that of the last row.
+        :raises KeyError: if values names a signal not known to this object.
+        """
+
+        this.extend([(timestamp, values)])
 
-    def __init__(this):
-        """__init__.
+    def extend(this, rows):
+        """extend.
 
-        Instantiates a new collection of waves, containing no sample data. Once
-        instantiated, use the .loadText() or .loadVCD() methods to populate
-        this object with sample data.
+        Append rows to the end of the stored sample data, as if by calling
+        append() on each of them in turn. Either all of the rows are appended,
+        or none of them are.
 
-        :param this:
+        :param rows: iterable of (timestamp, values) tuples, in the same
+            format as append()'s arguments and this.data.
+        :raises ValueError: if the timestamps are not strictly increasing, or
+            the first is not after that of the last row already stored.
+        :raises KeyError: if a row names a signal not known to this object.
         """
 
-        # List of tuples, where each tuple has the format (timestamp, signals),
-        # and signals is a dict where keys are signal names, and values are the
-        # signal values at the given timestep.
-        #
-        # This data structure must be kept sorted by timestamp.
-        this.data = []
+        signals = list(this.sizes.keys())
+        previous = {s: 0 for s in signals}
+        if this.samples() > 0:
+            previous = this.row(this.samples() - 1)[1]
+
+        timestamps = []
+        columns = {s: [] for s in signals}
+        for timestamp, values in rows:
+            for s in values:
+                if s not in this.sizes:
+                    raise KeyError("Unknown signal '{}'".format(s))
+
+            timestamps.append(timestamp)
+            for s in signals:
+                previous[s] = values.get(s, previous[s])
+                columns[s].append(previous[s])
+
+        this.extendColumns(timestamps, columns)
+
+    def extendColumns(this, timestamps, columns: dict):
+        """extendColumns.
+
+        Append rows to the end of the stored sample data, given as a column
+        of values for each signal rather than row by row. This is the fastest
+        way to append many rows at once.
+
+        :param timestamps: sequence or array of the timestamps of the new rows.
+        :param columns: dict associating every signal name in this.sizes with
+            a sequence or array of its values in the new rows.
+        :type columns: dict
+        :raises ValueError: if the timestamps are not strictly increasing, or
+            the first is not after that of the last row already stored.
+        :raises KeyError: if a signal is missing from columns.
+        """
 
-        # Hash table associating signal names with their widths in bits. All
-        # signals in the waveform must have a key in this table.
-        this.sizes = {}
+        for s in this.sizes:
+            if s not in columns:
+                raise KeyError("Missing values for signal '{}'".format(s))
+
+        this._extendStorage(
+                numpy.asarray(timestamps, dtype=numpy.float64),
+                {s: _toColumn(columns[s], this.sizes[s]) for s in this.sizes})
 
     def signals(this): # -> list[str]:
         """signals.
@@ -70,7 +2985,7 @@ class Waves:
         :returns: the number of samples recorded in this Waves object.
         """
 
-        return len(this.data)
+        return len(this._ticks)
 
     def mask(this, signal: str): # -> int:
         """mask.
@@ -89,12 +3004,7 @@ class Waves:
         if signal not in this.sizes.keys():
             raise KeyError("Unknown signal '{}'".format(signal))
 
-        size = this.sizes[signal]
-        mask = 0
-        for i in range(size):
-            mask = (mask << 1) | 1
-
-        return mask
+        return _widthMask(this.sizes[signal])
 
     def indexOfTime(this, time: float) -> int:
         """indexOfTime.
@@ -110,37 +3020,24 @@ class Waves:
         :rtype: int
         """
 
-        # Perform a binary search to find the appropriate index into this.data.
-        index = int(len(this.data)/2)
-        step = int(len(this.data)/2)
-        while True:
-            # end conditions
-            if index >= (len(this.data)-1):
-                if step > 2:
-                    index = len(this.data)-1
-                else:
-                    return len(this.data)-1
-
-            if index <= 0:
-                if step > 2:
-                    index = 0
-                else:
-                    return 0
+        # The index we want is the one just before the first timestamp which
+        # is strictly greater than time. Times earlier than the first sample
+        # clamp to index 0.
+        return max(this._rowsAtOrBefore(time) - 1, 0)
 
-            if (this.data[index][0] <= time) and (this.data[index+1][0] > time):
-                return index
+    def _indicesOfTimes(this, times):
+        """_indicesOfTimes.
 
-            # time is too small
-            if this.data[index][0] < time:
-                index = index + step
-            else:
-                index = index - step
+        Vectorized form of indexOfTime(), which resolves an entire array of
+        times in one call.
 
-            step = float(step) / 2.0
-            if step < 1.0:
-                step = 1
-            step = int(step)
+        :param times: array-like of times to find the indices of.
+        :returns: an array of the indices at which each time is current.
+        :rtype: numpy.ndarray
+        """
 
+        indices = this._ticks.searchsorted(_ticksAtOrBefore(times, this._digits), side="right") - 1
+        return numpy.maximum(indices, 0)
 
     def signalAt(this, signal: str, time: float) -> int:
         """signalAt.
@@ -167,24 +3064,203 @@ class Waves:
         if time < 0:
             raise ValueError("Time cannot be negative, got {}.".format(time))
 
-        if len(this.data) < 1:
+        if this.samples() < 1:
             return 0
 
-        return this.mask(signal) & this.data[this.indexOfTime(time)][1][signal]
+        return this.mask(signal) & int(this._columns[signal][this.indexOfTime(time)])
+
+    def signalAtMany(this, signal: str, times):
+        """signalAtMany.
+
+        This function retrieves the value of a signal at each of an array of
+        points in time. It is equivalent to calling signalAt() once per
+        time, but resolves all of the times in a single vectorized pass.
+
+        If no signal data is recorded in this object, then every value
+        returned is 0.
+
+        :param signal: The name of the signal.
+        :type signal: str
+        :param times: The times at which the signal is to be sampled. These
+            do not need to be sorted.
+        :type times: array-like of float
+        :returns: The signal values at the requested times, in the same order
+            as times.
+        :rtype: numpy.ndarray
+        :raises ValueError: if any time is negative.
+        :raises KeyError: if signal is not a know signal name for this object.
+        """
+
+        if signal not in this.sizes.keys():
+            raise KeyError("Unknown signal '{}'".format(signal))
+
+        times = numpy.asarray(times, dtype=numpy.float64)
+        if (times.size > 0) and (times.min() < 0):
+            raise ValueError("Time cannot be negative, got {}.".format(times.min()))
+
+        if this.samples() < 1:
+            return numpy.zeros(times.shape, dtype=_dtypeForWidth(this.sizes[signal]))
+
+        return _maskColumn(this._columns[signal][this._indicesOfTimes(times)], this.sizes[signal])
+
+    def resample(this, period: float, t0: float=None, t1: float=None, signals: list=None):
+        """resample.
+
+        Sample signals on a uniform grid of times, holding each signal's
+        value between samples as signalAt() does. The grid consists of the
+        times t0 + k * period for k = 0, 1, ..., up to and including t1. If
+        t0, t1 and period have few enough decimal places, the grid times are
+        computed exactly in decimal, so for example a period of 0.1 from 0 to
+        0.3 gives 4 times, the last of which is 0.3.
+
+        The whole result is built in memory; use iterResample() to process a
+        grid too large for that a block at a time.
+
+        :param period: The spacing of the grid.
+        :type period: float
+        :param t0: The first time on the grid. Defaults to the timestamp of the
+            first sample, or 0 if there are none.
+        :type t0: float
+        :param t1: The last time which may be on the grid. Defaults to the
+            timestamp of the last sample, or t0 if there are none.
+        :type t1: float
+        :param signals: The names of the signals to sample, in the order of
+            the columns of the result. Defaults to all signals.
+        :type signals: list[str]
+        :returns: A 2D array with a row for each time on the grid, and a column
+            for each signal. The dtype is wide enough for every signal.
+        :rtype: numpy.ndarray
+        :raises ValueError: if period is not positive, or t0 is negative.
+        :raises KeyError: if a signal is not a known signal name for this
+            object.
+        """
+
+        blocks = [values for times, values in this.iterResample(period, t0, t1, signals)]
+        if len(blocks) == 0:
+            signals = this._resampleSignals(signals)
+            return numpy.zeros((0, len(signals)), dtype=this._resampleDtype(signals))
+
+        return numpy.concatenate(blocks)
+
+    def iterResample(this, period: float, t0: float=None, t1: float=None, signals: list=None, chunkRows: int=1 << 16):
+        """iterResample.
+
+        Chunked form of resample(), which yields the result a block of grid
+        times at a time rather than all at once.
+
+        :param period: The spacing of the grid.
+        :type period: float
+        :param t0: The first time on the grid, as for resample().
+        :type t0: float
+        :param t1: The last time which may be on the grid, as for resample().
+        :type t1: float
+        :param signals: The names of the signals to sample, as for resample().
+        :type signals: list[str]
+        :param chunkRows: The largest number of grid times in each block.
+        :type chunkRows: int
+        :returns: A generator yielding a tuple for each block, holding a 1D
+            array of the grid times in the block, and a 2D array of the values
+            sampled at those times as for resample().
+        :raises ValueError: if period is not positive, or t0 is negative.
+        :raises KeyError: if a signal is not a known signal name for this
+            object.
+        """
+
+        signals = this._resampleSignals(signals)
+        dtype = this._resampleDtype(signals)
+
+        if not (period > 0):
+            raise ValueError("Period must be positive, got {}.".format(period))
+
+        if t0 is None:
+            t0 = this.row(0)[0] if this.samples() > 0 else 0.0
+        if t1 is None:
+            t1 = this.row(-1)[0] if this.samples() > 0 else t0
+
+        if t0 < 0:
+            raise ValueError("Time cannot be negative, got {}.".format(t0))
+
+        # When t0, t1 and period are all whole numbers of some decimal tick,
+        # the grid is counted in ticks, so that t1 is on it whenever it is a
+        # whole number of periods after t0. Otherwise the float quotient may
+        # be rounded down past such a t1, so it is allowed a few ulps of
+        # slack, and the grid is clamped to t1.
+        digits = _digitsOfTimes([t0, t1, period])
+        if t1 < t0:
+            count = 0
+        elif digits != _FLOAT_TICKS:
+            first, last, step = _ticksFromTimes([t0, t1, period], digits).tolist()
+            count = (last - first) // step + 1
+        else:
+            count = int(numpy.floor((t1 - t0) / period + 8 * numpy.finfo(numpy.float64).eps * t1 / period)) + 1
+
+        for start in range(0, count, chunkRows):
+            k = numpy.arange(start, min(start + chunkRows, count), dtype=numpy.int64)
+            if digits != _FLOAT_TICKS:
+                times = _timesFromTicks(first + step * k, digits)
+            else:
+                times = numpy.minimum(t0 + period * k, t1)
+            values = numpy.zeros((len(times), len(signals)), dtype=dtype)
+
+            if this.samples() > 0:
+                indices = this._indicesOfTimes(times)
+                for j, s in enumerate(signals):
+                    values[:, j] = _maskColumn(this._columns[s][indices], this.sizes[s])
+
+            yield times, values
+
+    def _resampleSignals(this, signals: list) -> list:
+        """_resampleSignals.
+
+        :param signals: signal names passed to resample(), or None.
+        :returns: the names of the signals to sample.
+        :rtype: list[str]
+        :raises KeyError: if a signal is not a known signal name for this
+            object.
+        """
+
+        if signals is None:
+            return list(this.sizes.keys())
+
+        for s in signals:
+            if s not in this.sizes:
+                raise KeyError("Unknown signal '{}'".format(s))
+
+        return list(signals)
+
+    def _resampleDtype(this, signals: list):
+        """_resampleDtype.
+
+        :returns: the narrowest dtype which fits all of the given signals.
+        """
+
+        if len(signals) == 0:
+            return numpy.dtype(numpy.uint8)
+
+        return numpy.result_type(*[_dtypeForWidth(this.sizes[s]) for s in signals])
 
 
     def nextEdge(this, signal: str, time: float, posedge: bool=True, negedge: bool=True): #-> tuple[float, bool]:
         """nextEdge.
 
-        This function finds the time at which the next edge occurs starting
-        at the specified time.
+        This function finds the time at which the next edge occurs after the
+        specified time. Only edges with timestamps strictly after time are
+        reported, so that an edge can be passed back in to find the one after
+        it.
 
         If no signal data is recorded in this object, then this function
         returns +Inf, False.
 
+        Samples at which no signal changes are dropped when loading, so the
+        time of the sample just before an edge is not always known.
+        Older versions of this library skipped an edge if time fell strictly
+        between it and the sample before it, and never reported an edge at
+        the final sample. Both of these depend on the dropped samples, and
+        such edges are now reported.
+
         :param signal: The name of the signal.
         :type signal: str
-        :param time: The time of the earliest edge to be reported.
+        :param time: Only edges strictly after this time are reported.
         :type time: float
         :param posedge: If this parameter is True, then rising edges will be
             reported, otherwise they will be omitted.
@@ -206,31 +3282,222 @@ class Waves:
         if time < 0:
             raise ValueError("Time cannot be negative, got {}.".format(time))
 
-        if len(this.data) < 1:
+        if this.samples() < 1:
             return float('inf'), False
 
-        index = this.indexOfTime(time) 
+        # The first candidate is the first sample strictly after time. The
+        # edge index never contains sample 0, since definitionally an edge
+        # cannot occur there.
+        first = this._rowsAtOrBefore(time)
 
-        # definitionally, an edge cannot occur at time 0, and it messes it up
-        # when we check for the delta
-        if index == 0:
-            index = 1
+        rising, falling = this._edgeIndex(signal)
+        index = None
+        for edges, wanted in ((rising, posedge), (falling, negedge)):
+            if not wanted:
+                continue
 
-        while True:
-            if index >= (len(this.data)-1):
-                return float('inf'), False
+            pos = int(edges.searchsorted(first, side="left"))
+            if pos < len(edges):
+                if (index is None) or (edges[pos] < index):
+                    index = int(edges[pos])
 
-            if this.data[index-1][0] < time:
-                index += 1
-                continue
+        if index is None:
+            return float('inf'), False
+
+        return float(this._times(index)), True
+
+    def diff(this, other, signals: list=None, tolerance: float=0):
+        """diff.
+
+        This function finds where two captures disagree. Both are sampled at
+        every timestamp of either of them, and the values of each signal are
+        compared, holding values between samples as signalAt() does.
+
+        :param other: The capture to compare this one with.
+        :type other: Waves
+        :param signals: The names of the signals to compare, which must be
+            present in both captures. Defaults to every signal which is.
+        :type signals: list[str]
+        :param tolerance: Disagreements lasting no longer than this are not
+            reported, which allows for edges which have moved slightly, for
+            example by rounding timestamps.
+        :type tolerance: float
+        :returns: A dict associating each signal compared with a list of the
+            intervals over which the captures disagree, as (start, end)
+            tuples of times, in order. The end of an interval is the time at
+            which the captures agree again, or +Inf if they never do.
+        :rtype: dict
+        :raises KeyError: if a signal is not a known signal name for either
+            capture.
+        """
+
+        if signals is None:
+            signals = [s for s in this.sizes if s in other.sizes]
+
+        for s in signals:
+            for w in (this, other):
+                if s not in w.sizes:
+                    raise KeyError("Unknown signal '{}'".format(s))
+
+        timestamps = _mergeTimestamps([this.timeColumn(), other.timeColumn()])
+        bounds = numpy.append(timestamps, numpy.inf)
+
+        result = {}
+        for s in signals:
+            differs = this.signalAtMany(s, timestamps) != other.signalAtMany(s, timestamps)
+
+            # runs of rows which differ start where differs goes from False to
+            # True, and end where it goes back
+            runs = numpy.flatnonzero(numpy.diff(numpy.concatenate([[False], differs, [False]]).astype(numpy.int8)))
+            starts, ends = bounds[runs[0::2]], bounds[runs[1::2]]
 
-            if posedge and (this.data[index-1][1][signal] < this.data[index][1][signal]):
-                return this.data[index][0], True
+            keep = (ends - starts) > tolerance
+            result[s] = list(zip(starts[keep].tolist(), ends[keep].tolist()))
 
-            if negedge and (this.data[index-1][1][signal] > this.data[index][1][signal]):
-                return this.data[index][0], True
+        return result
 
-            index += 1
+    def iterEdges(this, signal: str, start: float=0, end: float=None, posedge: bool=True, negedge: bool=True):
+        """iterEdges.
+
+        This function iterates over every edge of a signal in a range of
+        time, in order. Unlike repeatedly calling nextEdge(), all of the edges
+        are found in one pass over the signal's edge index.
+
+        :param signal: The name of the signal.
+        :type signal: str
+        :param start: The time of the earliest edge to be reported.
+        :type start: float
+        :param end: Only edges strictly before this time are reported. If it is
+            None, edges are reported up to the end of the sample data.
+        :type end: float
+        :param posedge: If this parameter is True, then rising edges will be
+            reported, otherwise they will be omitted.
+        :type posedge: bool
+        :param negedge: If this parameter is True, then falling edges will be
+            reported, otherwise they will be omitted.
+        :type negedge: bool
+        :returns: An iterator over a tuple for each edge, holding the sample
+            index at which the edge occurs and its time.
+        :raises ValueError: if start is negative.
+        :raises KeyError: if signal is not a know signal name for this object.
+        """
+
+        indices = this._edgesBetween(signal, start, end, posedge, negedge)
+        return zip(indices.tolist(), this._times(indices).tolist())
+
+    def sampleOnEdges(this, clock: str, data: list, posedge: bool=True, negedge: bool=True, gate: tuple=None, start: float=0, end: float=None):
+        """sampleOnEdges.
+
+        This function samples data signals on the edges of a clock, as a
+        synchronous receiver would. Each data signal is read at the sample at
+        which the clock edge occurs, that is, just after the edge. Edges can
+        optionally be gated by another signal, such as a chip select, so that
+        only edges during which it is active are kept.
+
+        :param clock: The name of the clock signal.
+        :type clock: str
+        :param data: The names of the data signals to sample.
+        :type data: list[str]
+        :param posedge: If this parameter is True, then data is sampled on
+            rising edges of the clock.
+        :type posedge: bool
+        :param negedge: If this parameter is True, then data is sampled on
+            falling edges of the clock.
+        :type negedge: bool
+        :param gate: Either None, or a tuple of a signal name and a value. If
+            given, only clock edges at which that signal has that value are
+            kept.
+        :type gate: tuple[str, int]
+        :param start: The time of the earliest edge to be sampled on.
+        :type start: float
+        :param end: Only edges strictly before this time are sampled on, as for
+            iterEdges().
+        :type end: float
+        :returns: The first return value is an array of the times of the clock
+            edges which were kept. The second is a dict associating each data
+            signal name with an array of its values at those edges.
+        :rtype: tuple[numpy.ndarray, dict]
+        :raises ValueError: if start is negative.
+        :raises KeyError: if a signal is not a known signal name for this
+            object.
+        """
+
+        for s in list(data) + ([gate[0]] if gate is not None else []):
+            if s not in this.sizes.keys():
+                raise KeyError("Unknown signal '{}'".format(s))
+
+        indices = this._edgesBetween(clock, start, end, posedge, negedge)
+
+        if gate is not None:
+            signal, active = gate
+            indices = indices[_maskColumn(this._columns[signal][indices], this.sizes[signal]) == (active & this.mask(signal))]
+
+        return this._times(indices), {s: _maskColumn(this._columns[s][indices], this.sizes[s]) for s in data}
+
+    def _edgesBetween(this, signal: str, start: float, end: float, posedge: bool, negedge: bool):
+        """_edgesBetween.
+
+        Array form of iterEdges().
+
+        :returns: a sorted array of the sample indices of the edges.
+        :rtype: numpy.ndarray
+        """
+
+        if signal not in this.sizes.keys():
+            raise KeyError("Unknown signal '{}'".format(signal))
+
+        if start < 0:
+            raise ValueError("Time cannot be negative, got {}.".format(start))
+
+        first = this._rowsBefore(start)
+        stop = this.samples()
+        if end is not None:
+            stop = this._rowsBefore(end)
+
+        if stop <= first:
+            return numpy.zeros(0, dtype=numpy.intp)
+
+        rising, falling = this._edgeIndex(signal)
+        parts = []
+        for edges, wanted in ((rising, posedge), (falling, negedge)):
+            if wanted:
+                parts.append(edges[edges.searchsorted(first, side="left"):edges.searchsorted(stop, side="left")])
+
+        if len(parts) == 0:
+            return numpy.zeros(0, dtype=numpy.intp)
+        if len(parts) == 1:
+            return parts[0].astype(numpy.intp, copy=False)
+
+        # rising and falling edges never share a sample index
+        return numpy.sort(numpy.concatenate(parts)).astype(numpy.intp, copy=False)
+
+    def _edgeIndex(this, signal: str):
+        """_edgeIndex.
+
+        Retrieve the edge index for the given signal, building it on first
+        use. The edge index is a pair of sorted arrays holding the sample
+        indices at which the signal rises and falls respectively, where a
+        sample is an edge if its value differs from that of the sample before
+        it. Edge indices are cached until the sample data is replaced.
+
+        :param signal: The name of the signal.
+        :type signal: str
+        :returns: sample indices of rising edges, and of falling edges.
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        """
+
+        if signal not in this._edges:
+            values = this._columns[signal]
+            if isinstance(values, _SparseColumn):
+                this._edges[signal] = values.edges()
+                return this._edges[signal]
+
+            before, after = values[:-1], values[1:]
+            rising = numpy.flatnonzero(before < after) + 1
+            falling = numpy.flatnonzero(before > after) + 1
+            this._edges[signal] = (rising, falling)
+
+        return this._edges[signal]
 
     def toText(this) -> str:
         """toText.
@@ -241,16 +3508,44 @@ class Waves:
         :rtype: str
         """
 
+        f = StringIO()
+        this.writeText(f)
+        return f.getvalue()
+
+    def writeText(this, fileobj):
+        """writeText.
+
+        Write the contents of the wave object to a file object in the text
+        format used in this course, as for toText(). Rows are formatted and
+        written a block at a time, so the text is never held in memory all at
+        once.
+
+        :param fileobj: The file object to write to, opened in either text or
+            binary mode.
+        """
+
+        write = _textOutput(fileobj).write
+
         signals = list(this.sizes.keys())
 
-        s = "{}\n".format(len(this.data))
-        s += "{}\n".format("\t".join(signals))
-        s += "{}".format("\t".join([str(this.sizes[k]) for k in signals]))
-        for index in range(len(this.data)):
-            s += "\n{}\t{}".format(str(this.data[index][0]), "\t".join([str(this.data[index][1][k]) for k in signals]))
+        write("\n".join([
+            str(this.samples()),
+            "\t".join(signals),
+            "\t".join([str(this.sizes[k]) for k in signals]),
+        ]))
+
+        for start in range(0, this.samples(), _WRITE_ROWS):
+            end = start + _WRITE_ROWS
+            times = [str(t) for t in this._times(start, end).tolist()]
+            columns = [_formatColumn(this._columns[k][start:end]) for k in signals]
 
+            if len(columns) > 0:
+                lines = map("\t".join, zip(times, *columns))
+            else:
+                lines = [t + "\t" for t in times]
 
-        return s
+            write("\n")
+            write("\n".join(lines))
 
     def loadText(this, text: str):
         """loadText.
@@ -258,6 +3553,9 @@ class Waves:
         This function loads a file stored in the text format used in this
         course. Any data already stored in this object is destroyed.
 
+        If a ParseCache is enabled (see Waves.parseCache) and holds the text,
+        it is loaded from there instead, as by loadBinary().
+
         :param text: The contents of the text file to load.
         :type text: str
         :raises ValueError: If a syntax error occurs while parsing the text. If
@@ -265,123 +3563,363 @@ class Waves:
             parsed into is undefined.
         """
 
-        linum = 1
-        trueline = 1  # lines including comments and empties, just for error messages
-        signals = []
-        widths = []
-        for line in [l.strip() for l in text.split("\n")]:
-
-            # ignore comments
-            if (len(line.strip()) >= 1) and (line.strip()[0] == '#'):
-                trueline += 1
-                continue
+        cache = this.parseCache
+        if cache is None:
+            this._parseText(_textBlocks(text))
+            return
 
-            # ignore empty lines
-            if len(line.strip()) == 0:
-                trueline += 1
-                continue
+        key = cache.key(text.encode("utf-8", "surrogatepass"))
+        if not cache.load(key, this):
+            this._parseText(_textBlocks(text))
+            cache.store(key, this)
 
-            if linum == 1:
-                # this is just the number of records, we don't need to know
-                # this
-                pass
-
-            elif linum == 2:
-                # parse the list of signals
-                for s in line.split("\t"):
-                    signals.append(s.strip())
-
-            elif linum == 3:
-                # parse the signal widths
-                i = 0
-                for w in line.split("\t"):
-                    wv = 0
-                    w = w.strip()
-                    try:
-                        wv = int(w)
-                    except Exception as e:
-                        if i < len(signals):
-                            raise ValueError("Could not parse signal width '{}' for signal '{}' due to error: '{}'".format(w, signals[i], e))
-                        else:
-                            raise ValueError("Could not parse signal width '{}' for out of bounds signal due to error: '{}'".format(w, e))
+    def loadTextStream(this, fileobj):
+        """loadTextStream.
 
-                    widths.append(wv)
+        This function loads a file stored in the text format used in this
+        course, reading it line by line from an open file object rather than
+        requiring the whole text in memory. Any data already stored in this
+        object is destroyed.
 
-                if len(widths) != len(signals):
-                    raise ValueError("Number of signals ({}) must match number of signal widths ({})".format(len(signals), len(widths)))
+        The file object may be opened in either text or binary mode. Binary
+        streams which are gzip-compressed are decompressed transparently; a
+        text mode stream such as sys.stdin is read as-is.
 
-                this.sizes = {}
-                for i in range(len(signals)):
-                    this.sizes[signals[i]] = widths[i]
+        If a ParseCache is enabled (see Waves.parseCache), the file object is
+        hashed before it is parsed, and loaded from the cache if it holds the
+        same contents. Hashing a file object which is not seekable, such as a
+        pipe, reads it into memory.
 
-                this.data = []
+        :param fileobj: The file object to read from.
+        :raises ValueError: If a syntax error occurs while parsing the text. If
+            an exception occurs while parsing, the state of the object being
+            parsed into is undefined.
+        """
 
+        cache = this.parseCache
+        if cache is None:
+            this._parseText(_streamBlocks(fileobj))
+            return
+
+        key, fileobj = _hashStream(fileobj)
+        if not cache.load(key, this):
+            this._parseText(_streamBlocks(fileobj))
+            cache.store(key, this)
+
+    @classmethod
+    def fromFile(cls, path):
+        """fromFile.
+
+        Instantiates a new collection of waves from a file stored either in
+        the text format used in this course, which may be gzip-compressed, or
+        in the binary format written by saveBinary(), which is memory-mapped
+        as by loadBinary().
+
+        :param path: Path to the file to load.
+        :returns: The loaded waves.
+        :rtype: Waves
+        :raises ValueError: If a syntax error occurs while parsing the file.
+        """
 
+        w = cls()
+        with open(path, "rb") as f:
+            if f.peek(len(_BINARY_MAGIC))[:len(_BINARY_MAGIC)] == _BINARY_MAGIC:
+                w.loadBinary(path)
             else:
+                w.loadTextStream(f)
+        return w
+
+    @staticmethod
+    def buildTextIndex(path, stride: int=_INDEX_STRIDE) -> str:
+        """buildTextIndex.
+
+        Build the sidecar index which loadTextRange() uses to read part of a
+        text file, and save it next to the file, with ".wvi" appended to its
+        name. The index records the byte offset, timestamp and signal values
+        of every stride'th sample row, so building it takes one pass over the
+        file, but loading a range then only reads about stride rows more than
+        the range holds.
+
+        :param path: Path to the text file, which must not be compressed.
+        :param stride: The number of rows between checkpoints.
+        :type stride: int
+        :returns: The path of the index.
+        :rtype: str
+        :raises ValueError: if the file is gzip-compressed, or its header or
+            a checkpoint row cannot be parsed.
+        """
 
-                line = [f.strip() for f in line.split("\t")]
-
-                if len(line) != 1 + len(signals):
-                    raise ValueError("On line {}, line must contain {} components, but has {}".format(trueline, 1 + len(signals), len(line)))
+        index = _TextIndex.build(path, stride)
+        index.save(_TextIndex.pathFor(path))
+        return _TextIndex.pathFor(path)
+
+    def loadTextRange(this, path, t0: float, t1: float, stride: int=_INDEX_STRIDE):
+        """loadTextRange.
+
+        This function loads the samples between two points in time from a file
+        stored in the text format used in this course, without reading the
+        rest of the file. Any data already stored in this object is destroyed.
+
+        The rows loaded are the same as those of window(t0, t1) after loading
+        the whole file: the row current at t0, followed by the rows with
+        timestamps in (t0, t1).
+
+        The file's sidecar index (see buildTextIndex()) is used to seek to the
+        last checkpoint at or before t0. If the index does not exist, or the
+        file has changed since it was built, it is built first, with the given
+        stride.
+
+        :param path: Path to the text file, which must not be compressed.
+        :param t0: The start of the range.
+        :type t0: float
+        :param t1: The end of the range, which is not included in it.
+        :type t1: float
+        :param stride: The number of rows between checkpoints, if the index
+            needs to be built.
+        :type stride: int
+        :raises ValueError: if t0 is negative, t1 is less than t0, or a syntax
+            error occurs while parsing the file.
+        """
 
-                timestamp = line[0]
+        if t0 < 0:
+            raise ValueError("Time cannot be negative, got {}.".format(t0))
+
+        if t1 < t0:
+            raise ValueError("Window end {} is before its start {}.".format(t1, t0))
+
+        index = _TextIndex.forFile(path, stride)
+        view = this._loadTextRangeFrom(path, index, t0, t1)
+        if view is None:
+            # a checkpoint row did not match, so the index is out of date even
+            # though the file's size and modification time are not
+            index = _TextIndex.rebuild(path, stride)
+            view = this._loadTextRangeFrom(path, index, t0, t1)
+            if view is None:
+                raise ValueError("Text file '{}' changed while it was being read".format(os.fspath(path)))
+
+        this.sizes = dict(view.sizes)
+        this._setStorage(view._ticks, view._digits, view._columns)
+
+    @staticmethod
+    def _loadTextRangeFrom(path, index, t0: float, t1: float):
+        """_loadTextRangeFrom.
+
+        Load the samples between two points in time from a text file, using
+        its sidecar index to seek to the last checkpoint at or before t0.
+
+        Rows at which no signal changed are dropped when loading, so if the
+        row current at t0 is the checkpoint row itself, it may be one which
+        loading the whole file would have dropped. The rows are then parsed
+        again from the last checkpoint after which the checkpoint states
+        show a change, which the row current at t0 cannot be before.
+
+        :param path: path to the text file.
+        :param index: the file's sidecar index.
+        :type index: _TextIndex
+        :returns: a view of the samples, as returned by window(t0, t1), or
+            None if a checkpoint row does not match the index.
+        :rtype: Waves
+        """
 
-                try:
-                    timestamp = float(timestamp)
+        checkpoint = max(int(index.times.searchsorted(t0, side="right")) - 1, 0)
+        w = Waves._loadTextFrom(path, index, checkpoint, t1)
+        if (w is not None) and (checkpoint > 0) and (w.indexOfTime(t0) == 0):
+            # changed[i] is True if some signal changed after checkpoint i,
+            # up to and including checkpoint i + 1
+            changed = numpy.zeros(checkpoint, dtype=bool)
+            for s in index.sizes:
+                states = index.states[s][:checkpoint + 1]
+                changed |= states[1:] != states[:-1]
+            found = numpy.flatnonzero(changed)
+            w = Waves._loadTextFrom(path, index, int(found[-1]) if len(found) > 0 else 0, t1)
+
+        if w is None:
+            return None
+        return w.window(t0, t1)
+
+    @staticmethod
+    def _loadTextFrom(path, index, checkpoint: int, t1: float):
+        """_loadTextFrom.
+
+        Parse the rows of a text file from a checkpoint up to the first row
+        after t1. The last row parsed is kept even if no signal changed at it
+        (see _compact()), so stopping after t1 leaves it out of window(t0, t1).
+
+        :param path: path to the text file.
+        :param index: the file's sidecar index.
+        :type index: _TextIndex
+        :param checkpoint: the checkpoint to start from.
+        :type checkpoint: int
+        :returns: a new Waves object holding the rows, or None if the
+            checkpoint row does not match the index.
+        :rtype: Waves
+        """
 
-                except Exception as e:
-                    raise ValueError("On line {}, failed to parse timestamp '{}' due to error: '{}'".format(trueline, line[0], e))
+        w = Waves()
+        parser = _TextParser(w)
 
-                if timestamp < 0:
-                    raise ValueError("On line {}, timestamp {} is negative, which is not permitted".format(trueline, timestamp))
+        with open(path, "rb") as f:
+            parser.feed(f.read(index.headerBytes))
+            if w.sizes != index.sizes:
+                return None
 
-                if linum > 4:  # we have at least one previous data point
-                    if timestamp <= this.data[-1][0]:
-                        raise ValueError("On line {}, timestamp {} moves backwards - timestamps must be monotonically increasing".format(trueline, timestamp))
+            if len(index.offsets) > 0:
+                f.seek(int(index.offsets[checkpoint]))
+                parser.trueline = int(index.lines[checkpoint])
 
-                values = {}
-                for i in range(len(signals)):
-                    n = line[i+1]
-                    try:
-                         n = int(n)
-                    except Exception as e:
-                        raise ValueError("On line {}, failed to parse signal value for signal '{}' due to error: '{}'".format(trueline, signals[i], e))
+                for block in _streamBlocks(f):
+                    parser.feed(block)
+                    if (parser.previous is not None) and (parser.previous > t1):
+                        break
 
-                    values[signals[i]] = n
+        parser.finish()
+
+        if len(index.offsets) > 0:
+            if w.samples() == 0:
+                return None
+            timestamp, values = w.row(0)
+            if (timestamp != index.times[checkpoint]) or any((values[s] & w.mask(s)) != int(index.states[s][checkpoint]) for s in w.sizes):
+                return None
+
+        return w
+
+    @classmethod
+    def concat(cls, waves: list, offsets: list=None):
+        """concat.
+
+        Instantiates a new collection of waves holding the samples of several
+        captures of the same signals one after another, for example a long
+        session which was recorded in separate files.
+
+        :param waves: The captures to concatenate, in time order. They must
+            all have the same signals, with the same widths.
+        :type waves: list[Waves]
+        :param offsets: If given, an offset for each capture, which is added to
+            all of its timestamps. The offsets are rounded to the precision of
+            the timestamps, or to _MAX_DIGITS decimal places. If the results
+            have no exact ticks (see timescale), the offsets are added to
+            the float timestamps instead.
+        :type offsets: list[float]
+        :returns: The concatenated waves.
+        :rtype: Waves
+        :raises ValueError: if the captures do not have the same signals and
+            widths, or the timestamps of a capture do not all come after those
+            of the captures before it.
+        """
 
-                this.data.append( (timestamp, values) )
+        waves = list(waves)
+        if offsets is None:
+            offsets = [0] * len(waves)
+        offsets = list(offsets)
+        if len(offsets) != len(waves):
+            raise ValueError("Got {} offsets for {} captures".format(len(offsets), len(waves)))
+
+        result = cls()
+        if len(waves) == 0:
+            return result
+
+        result.sizes = dict(waves[0].sizes)
+        for i, w in enumerate(waves):
+            if w.sizes != result.sizes:
+                raise ValueError("Capture {} has signals {}, but capture 0 has {}".format(i, w.sizes, result.sizes))
+
+        # All of the captures are converted to ticks of the finest timescale
+        # of any of them or of the offsets, so that the offsets are exact,
+        # unless some capture has float ticks, or would not fit.
+        digits = _digitsOfTimes(offsets, max(w._digits for w in waves))
+        for i, w in enumerate(waves):
+            if (w.samples() == 0) or (digits == _FLOAT_TICKS):
+                continue
+            if w._digits == _FLOAT_TICKS:
+                digits = _FLOAT_TICKS
+                continue
 
+            shift = int(_ticksFromTimes([offsets[i]], digits)[0])
+            scale = 10 ** (digits - w._digits)
+            if max(abs(int(w._ticks[0]) * scale + shift), abs(int(w._ticks[-1]) * scale + shift)) >= _TICK_LIMIT:
+                digits = _FLOAT_TICKS
 
-            linum += 1
-            trueline += 1
+        ticks = []
+        last = None
+        for i, w in enumerate(waves):
+            if w.samples() == 0:
+                continue
 
+            if digits == _FLOAT_TICKS:
+                times = _ticksFromTimes(w._times(0, w.samples()) + offsets[i], digits)
+            else:
+                times = _rescaleTicks(w._ticks, w._digits, digits)
+                if offsets[i] != 0:
+                    times = times + int(_ticksFromTimes([offsets[i]], digits)[0])
+            if (last is not None) and not (times[0] > last):
+                raise ValueError("Capture {} starts at {}, which is not after the previous capture ends at {}".format(
+                        i, _timesFromTicks(times[0], digits), _timesFromTicks(last, digits)))
+            ticks.append(times)
+            last = times[-1]
+
+        result._setStorage(
+                numpy.concatenate([numpy.zeros(0, dtype=numpy.int64)] + ticks), digits,
+                {s: _concatColumns([w._columns[s] for w in waves if w.samples() > 0], _dtypeForWidth(result.sizes[s])) for s in result.sizes})
+        return result
+
+    @classmethod
+    def merge(cls, waves: list):
+        """merge.
+
+        Instantiates a new collection of waves holding the signals of several
+        captures on one timeline, for example captures of different parts of
+        a design which were recorded separately over the same period.
+
+        The timeline has a row at every timestamp of any of the captures, at
+        which each signal has the value it has at that time in its own
+        capture, as signalAt() would report it.
+
+        :param waves: The captures to merge. No signal may appear in more than
+            one of them.
+        :type waves: list[Waves]
+        :returns: The merged waves.
+        :rtype: Waves
+        :raises ValueError: if a signal appears in more than one capture.
+        """
 
-    def __enumerateVCDSignals(this, scope):
-        """__enumerateVCDSignals.
+        waves = [w for w in waves]
+        result = cls()
+        for i, w in enumerate(waves):
+            for s in w.sizes:
+                if s in result.sizes:
+                    raise ValueError("Signal '{}' appears in more than one capture, including capture {}".format(s, i))
+                result.sizes[s] = w.sizes[s]
+
+        timestamps = _mergeTimestamps([w.timeColumn() for w in waves])
+
+        columns = {}
+        for w in waves:
+            if w.samples() == 0:
+                for s in w.sizes:
+                    columns[s] = _SparseColumn.encode(numpy.zeros(len(timestamps), dtype=_dtypeForWidth(w.sizes[s])))
+                continue
 
-        Given a pyDigitalaveTools scope, enumerate all of the signals in it to
-        a flat dictionary.
+            indices = w._indicesOfTimes(timestamps)
+            for s in w.sizes:
+                columns[s] = _SparseColumn.encode(w._columns[s][indices])
 
-        :param scope:
-        """
+        digits = _digitsOfTimes(timestamps, max([w._digits for w in waves] + [0]))
+        result._setStorage(_ticksFromTimes(timestamps, digits), digits, columns)
+        return result
 
-        res = {}
+    def _parseText(this, blocks):
+        """_parseText.
 
-        name = scope.name + "."
-        if name == "root.":
-            name = ""
+        Parse the text format used in this course, as for loadText().
 
-        for child in scope.children.values():
-            if "children" in child.__dict__:
-                # nested scope
-                nested = this.__enumerateVCDSignals(child)
-                for signal in nested:
-                    res[name + signal] = nested[signal]
-            else:
-                #child
-                res[name + child.name] = child
+        :param blocks: iterable of blocks of UTF-8 encoded text, each of
+            which ends on a line boundary.
+        """
 
-        return res
+        parser = _TextParser(this)
+        for data in blocks:
+            parser.feed(data)
+        parser.finish()
 
 
     def loadVCD(this, text: str, timescale: float=0.0001):
@@ -397,72 +3935,36 @@ class Waves:
 
         :param text: VCD file contents to parse.
         :type text: str
-        :param timescale: VCD timestamps are multiplied by this value.
+        :param timescale: VCD timestamps are multiplied by this value. The
+            $timescale declared in the file is ignored.
         :type timescale: float
+        :raises ValueError: if the VCD file is malformed.
         """
 
-        this.data = []
-        this.sizes = {}
-
-        # parse the VCD file
-        vcd = VcdParser()
-        vcd.parse_str(text)
-        sigs = this.__enumerateVCDSignals(vcd.scope)
-
-        # extract all names and widths
-        for k in sigs:
-            sig = sigs[k]
-            if sig.sigType != "wire":
-                continue
-
-            this.sizes[k] = sig.width
-
-
-        #  Walk forward across all signals to get their values at a given
-        #  time. The timestamp is maintained in the VCD context.
-        timestamp = 0
-        while True:
-            if (timestamp-1) > vcd.now:
-                break
-
-            change = False
-            newVals = {}
-            for k in sigs:
-                sig = sigs[k]
-                if sig.sigType != "wire":
-                    continue
-
-                if len(sig.data) < 1:
-                    continue
-
-                i = 1
-                while sig.data[i][0] < timestamp:
-                    i += 1
-                    if i >= len(sig.data):
-                        break
-                i -= 1
-
-                valueAtTimestamp = sig.data[i][1]
-                valueAtTimestamp = valueAtTimestamp.replace("X", "0")
-                valueAtTimestamp = valueAtTimestamp.replace("x", "0")
-                valueAtTimestamp = valueAtTimestamp.replace("Z", "0")
-                valueAtTimestamp = valueAtTimestamp.replace("z", "0")
+        this.loadVCDStream(StringIO(text), timescale)
 
-                if valueAtTimestamp[0] == 'b':
-                    valueAtTimestamp = int(valueAtTimestamp[1:], 2)
-
-                else:
-                    valueAtTimestamp = int(valueAtTimestamp)
+    def loadVCDStream(this, fileobj, timescale: float=0.0001):
+        """loadVCDStream.
 
-                newVals[k] = valueAtTimestamp & this.mask(k)
+        This method overwrites whatever data is stored in this Waves object
+        with the contents of a VCD file, which is read incrementally from an
+        open file object, as for loadVCD(). Only the resulting rows are held
+        in memory, not the file or its change lists.
 
-                if (len(this.data) == 0) or (valueAtTimestamp != this.data[-1][1][k]):
-                    change = True
+        The file object may be opened in either text or binary mode, and
+        binary streams which are gzip-compressed are decompressed
+        transparently.
 
-            if change:
-                this.data.append((timestamp * timescale, newVals))
+        :param fileobj: The file object to read from.
+        :param timescale: VCD timestamps are multiplied by this value. The
+            $timescale declared in the file is ignored.
+        :type timescale: float
+        :raises ValueError: if the VCD file is malformed.
+        """
 
-            timestamp += 1
+        reader = _VCDReader(this, timescale)
+        reader.read(token for block in _streamBlocks(fileobj) for token in block.decode("utf-8").split())
+        reader.finish()
 
     def toVCD(this, timescale: float=10000):
         """toVCD.
@@ -474,8 +3976,37 @@ class Waves:
         :param timescale: time values will be multiplied by this amount
         """
 
-        f = StringIO("")
-        w = VcdWriter(oFile=f)
+        f = StringIO()
+        this.writeVCD(f, timescale)
+        return f.getvalue()
+
+    def writeVCD(this, fileobj, timescale: float=10000):
+        """writeVCD.
+
+        Write a VCD file containing the data stored in this waves object to a
+        file object, as for toVCD().
+
+        Every signal is logged in the first row, after which only values which
+        differ from the previous row are logged, so the size of the output
+        depends on how many values change rather than on the number of rows.
+        The time of the last row is always written, even if no value changes
+        at it.
+
+        :param fileobj: The file object to write to, opened in either text or
+            binary mode.
+        :param timescale: time values will be multiplied by this amount
+        :type timescale: float
+        """
+
+        # https://github.com/Nic30/pyDigitalWaveTools
+        #
+        # This is only needed for writing VCD files, so it is imported here
+        # rather than every time this library is loaded.
+        from pyDigitalWaveTools.vcd.writer import VcdWriter
+        from pyDigitalWaveTools.vcd.common import VCD_SIG_TYPE
+        from pyDigitalWaveTools.vcd.value_format import VcdBitsFormatter
+
+        w = VcdWriter(oFile=_textOutput(fileobj))
 
         w.date(datetime.datetime.now())
         w.timescale(1)
@@ -486,17 +4017,377 @@ class Waves:
 
         w.enddefinitions()
 
-        for i in range(len(this.data)):
-            t, vals = this.data[i]
-            t *= timescale
-            for s in this.signals():
-                w.logChange(t, s, MaskedValue(vals[s], this.mask(s)), None)
+        if this.samples() == 0:
+            return
+
+        signals = list(this.signals())
+        masks = [this.mask(s) for s in signals]
+        columns = [this._columns[s] for s in signals]
+
+        t = this.row(0)[0] * timescale
+        for j in range(len(signals)):
+            w.logChange(t, signals[j], MaskedValue(int(columns[j][0]), masks[j]), None)
+
+        for start in range(1, this.samples(), _WRITE_ROWS):
+            end = min(start + _WRITE_ROWS, this.samples())
+
+            # gather the changes in this block of rows, ordered by row and
+            # then by signal
+            changes = [_changedRows(c, start, end) for c in columns]
+            rows = numpy.concatenate([numpy.zeros(0, dtype=numpy.intp)] + changes)
+            which = numpy.repeat(numpy.arange(len(signals)), [len(c) for c in changes])
+            order = numpy.lexsort((which, rows))
+
+            times = this._times(rows[order]).tolist()
+            for i, j, t in zip(rows[order].tolist(), which[order].tolist(), times):
+                w.logChange(t * timescale, signals[j], MaskedValue(int(columns[j][i]), masks[j]), None)
+
+        # the last row may not change any value, so log its time on its own
+        # to keep the end time of the capture
+        w.setTime(this.row(-1)[0] * timescale)
+
+    def saveBinary(this, path):
+        """saveBinary.
+
+        This method writes the data stored in this waves object to a file in
+        the binary wave format, which is documented at the top of this file
+        and can be loaded back with loadBinary().
+
+        The file is written under a temporary name and then renamed into
+        place, so it is safe to overwrite a file which is currently
+        memory-mapped, or which other processes or threads are writing.
+
+        :param path: Path to the file to write.
+        :raises ValueError: if a signal is wider than 64 bits.
+        """
+
+        header, arrays, total = _binaryLayout(this.sizes, this.samples(), this._digits)
+        _writeLayout(path, header, arrays, this._binaryColumns())
+
+    def _binaryColumns(this):
+        """_binaryColumns.
+
+        :returns: the arrays stored in a binary wave file, in the order of
+            _binaryLayout(): the timestamps, as ticks or as floats if they
+            have no decimal ticks, followed by the masked values of each
+            signal.
+        :rtype: list[numpy.ndarray]
+        """
+
+        times = this._ticks
+        if this._digits == _FLOAT_TICKS:
+            times = this._times(0, this.samples())
+        return [times] + [_maskColumn(this._columns[s][:], this.sizes[s]) for s in this.sizes]
+
+    def toSharedMemory(this):
+        """toSharedMemory.
+
+        This method copies the data stored in this waves object into a new
+        shared memory block, from which other processes can use it without
+        parsing or copying it, by passing the block's name to attachShared().
+        The block holds a binary wave file, as written by saveBinary().
+
+        The block is destroyed when the returned handle is closed or garbage
+        collected, so the handle must be kept for as long as new processes
+        may need to attach.
+
+        :returns: a handle to the shared memory block.
+        :rtype: SharedWaves
+        :raises ValueError: if a signal is wider than 64 bits.
+        """
+
+        from multiprocessing.shared_memory import SharedMemory
+
+        header, arrays, total = _binaryLayout(this.sizes, this.samples(), this._digits)
+        columns = this._binaryColumns()
+
+        block = SharedMemory(create=True, size=total)
+        shared = SharedWaves(block)
+        try:
+            block.buf[:len(header)] = header
+            for (offset, dtype), values in zip(arrays, columns):
+                numpy.frombuffer(block.buf, dtype=dtype, count=len(values), offset=offset)[:] = values
+        except BaseException:
+            shared.close()
+            raise
+
+        return shared
+
+    @classmethod
+    def attachShared(cls, name: str):
+        """attachShared.
+
+        Instantiates a new collection of waves from a shared memory block
+        created by toSharedMemory(), typically in another process.
+
+        The sample arrays are read-only views of the block, so attaching takes
+        no time regardless of its size, and no memory beyond what the block
+        already uses. The block stays mapped for as long as the returned
+        object holds them, even if its owner destroys it in the meantime;
+        nothing needs to be closed.
+
+        :param name: The name of the shared memory block, from the name of
+            the SharedWaves handle.
+        :type name: str
+        :returns: The shared waves.
+        :rtype: Waves
+        :raises FileNotFoundError: if there is no shared memory block with the
+            given name.
+        :raises ValueError: if the block does not hold a valid binary wave file.
+        """
+
+        w = cls()
+        w._loadBinaryBuffer(_mapShared(name))
+        return w
+
+    def loadBinary(this, path):
+        """loadBinary.
+
+        This method overwrites whatever data is stored in this Waves object
+        with the contents of a file in the binary wave format written by
+        saveBinary().
+
+        The file is memory-mapped rather than read, so loading is immediate
+        regardless of the file's size, and pages are only read from disk as
+        they are used. The resulting arrays are read-only views of the file,
+        which stays mapped for as long as this object holds them.
+
+        :param path: Path to the file to load.
+        :raises ValueError: if the file is not a valid binary wave file.
+        """
+
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError("Not a binary wave file (file is empty)")
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        this._loadBinaryBuffer(buffer)
+
+    def _loadBinaryBuffer(this, buffer):
+        """_loadBinaryBuffer.
+
+        Replace the stored sample data with zero-copy views of a buffer
+        holding a binary wave file.
+
+        :param buffer: object supporting the buffer protocol which holds the
+            contents of the file.
+        :raises ValueError: if the buffer does not hold a valid binary wave
+            file.
+        """
+
+        sizes, samples, digits, arrays = _readBinaryHeader(buffer)
+        views = [numpy.frombuffer(buffer, dtype=dtype, count=samples, offset=offset) for offset, dtype in arrays]
+
+        # version 1 files store timestamps as floats, as do version 2 files
+        # of captures with float ticks, and both are converted
+        ticks = views[0]
+        if digits is None:
+            digits = _digitsOfTimes(ticks)
+        if ticks.dtype.kind == "f":
+            ticks = _ticksFromTimes(ticks, digits)
+
+        this.sizes = sizes
+        this._setStorage(ticks, digits, {name: views[i+1] for i, name in enumerate(sizes)})
+
+
+# How _Profile counts the rows handled by a call to each public Waves method,
+# one of:
+#
+#   "samples"  the number of samples in the object after the call
+#   "result"   the length of the result, or its number of samples
+#   "added"    the number of samples the call added to the object
+#
+# Methods which are not listed look up a single sample, and count 1 row.
+_PROFILE_ROWS = {
+    "loadText": "samples",
+    "loadTextStream": "samples",
+    "loadVCD": "samples",
+    "loadVCDStream": "samples",
+    "loadBinary": "samples",
+    "toText": "samples",
+    "writeText": "samples",
+    "toVCD": "samples",
+    "writeVCD": "samples",
+    "saveBinary": "samples",
+    "toSharedMemory": "samples",
+    "timeColumn": "samples",
+    "tickColumn": "samples",
+    "column": "samples",
+    "diff": "samples",
+    "fromFile": "result",
+    "attachShared": "result",
+    "concat": "result",
+    "merge": "result",
+    "window": "result",
+    "signalAtMany": "result",
+    "resample": "result",
+    "sampleOnEdges": "result",
+    "append": "added",
+    "extend": "added",
+    "extendColumns": "added",
+}
+
+
+class _Profile:
+    """_Profile.
+
+    Opt-in instrumentation of the public methods of Waves, which records the
+    number of calls to each, the total time spent in them, and the number of
+    rows they handled (see _PROFILE_ROWS), and reports them when the process
+    exits. Times are inclusive, so a method which calls another, such as
+    toText() calling writeText(), counts the time of both.
+
+    It is enabled by setting the WAVES_PROFILE environment variable before
+    this library is imported. If it is "1" or "stderr", a summary table is
+    written to stderr; otherwise it is the path of a JSON file to write, in
+    which "{pid}" is replaced with the process ID. When it is not set, the
+    methods are left untouched, so there is no overhead at all.
+    """
+
+    def __init__(this, destination: str):
+        """__init__.
 
-        f.seek(0)
-        res = f.read()
-        f.close()
-        return res
+        :param destination: "stderr", or the path of the JSON file to write.
+        :type destination: str
+        """
+
+        this.destination = destination
+
+        # Hash table associating method names with a list of the number of
+        # calls, the total time in seconds, and the number of rows.
+        this.stats = {}
+        this.lock = threading.Lock()
+
+    @classmethod
+    def fromEnvironment(cls):
+        """fromEnvironment.
+
+        :returns: the profile configured by the WAVES_PROFILE environment
+            variable, or None if profiling is disabled.
+        :rtype: _Profile
+        """
+
+        destination = os.environ.get("WAVES_PROFILE", "")
+        if destination in ("", "0"):
+            return None
+        if destination == "1":
+            destination = "stderr"
+        return cls(destination)
+
+    def instrument(this, cls):
+        """instrument.
+
+        Replace each public method of a class, including classmethods and
+        staticmethods, with a wrapper which records its calls.
+
+        :param cls: the class to instrument.
+        """
+
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith("_"):
+                continue
+
+            if isinstance(attribute, (classmethod, staticmethod)):
+                setattr(cls, name, type(attribute)(this.wrap(name, attribute.__func__, isinstance(attribute, classmethod))))
+            elif callable(attribute):
+                setattr(cls, name, this.wrap(name, attribute, True))
+
+        atexit.register(this.report)
+
+    def wrap(this, name: str, function, bound: bool):
+        """wrap.
 
+        :param name: the name to record calls under.
+        :type name: str
+        :param function: the function to wrap.
+        :param bound: whether the function's first argument is the object or
+            class it is called on.
+        :type bound: bool
+        :returns: the wrapper.
+        """
+
+        rows = _PROFILE_ROWS.get(name)
+        stats = this.stats.setdefault(name, [0, 0.0, 0])
+        lock = this.lock
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # samples() is itself instrumented, so rows are counted from
+            # the storage directly
+            target = args[0] if bound and (len(args) > 0) else None
+            before = len(target._ticks) if (rows == "added") and isinstance(target, Waves) else 0
+
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+
+            if rows == "samples" and isinstance(target, Waves):
+                count = len(target._ticks)
+            elif rows == "added" and isinstance(target, Waves):
+                count = len(target._ticks) - before
+            elif rows == "result":
+                count = _profileLength(result)
+            else:
+                count = 1
+
+            with lock:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] += count
+            return result
+
+        return wrapper
+
+    def report(this):
+        """report.
+
+        Write the recorded statistics to the configured destination, unless
+        no methods were called.
+        """
+
+        stats = {name: s for name, s in this.stats.items() if s[0] > 0}
+        if len(stats) == 0:
+            return
+
+        if this.destination == "stderr":
+            lines = ["waves profile (pid {})".format(os.getpid()),
+                    "{:<16}{:>12}{:>14}{:>14}{:>14}".format("method", "calls", "total s", "mean us", "rows")]
+            for name, (calls, seconds, rows) in sorted(stats.items(), key=lambda item: -item[1][1]):
+                lines.append("{:<16}{:>12}{:>14.6f}{:>14.3f}{:>14}".format(name, calls, seconds, 1e6 * seconds / calls, rows))
+            sys.stderr.write("\n".join(lines) + "\n")
+            return
+
+        import json
+
+        path = this.destination.replace("{pid}", str(os.getpid()))
+        with open(path, "w") as f:
+            json.dump({
+                "pid": os.getpid(),
+                "methods": {name: {"calls": calls, "seconds": seconds, "rows": rows} for name, (calls, seconds, rows) in stats.items()},
+            }, f, indent=2, sort_keys=True)
+
+
+def _profileLength(result) -> int:
+    """_profileLength.
+
+    :returns: the number of rows in a method's result, as counted by
+        _Profile: the number of samples of a Waves object, the length of the
+        first element of a tuple, or the length of anything else.
+    :rtype: int
+    """
 
+    if isinstance(result, Waves):
+        return len(result._ticks)
+    if isinstance(result, tuple) and (len(result) > 0):
+        result = result[0]
+    try:
+        return len(result)
+    except TypeError:
+        return 1
 
 
+_profile = _Profile.fromEnvironment()
+if _profile is not None:
+    _profile.instrument(Waves)